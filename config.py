@@ -1,51 +1,200 @@
+import functools
+import json
 import os
-from typing import Dict
+import sys
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Final, FrozenSet, Mapping, Tuple
 
-from dotenv import load_dotenv
+ENV_FILE = Path(__file__).with_name(".env")
+SNAPSHOT_ENV_VAR = "CONFIG_SHM"
 
-load_dotenv()
 
+def _load_dotenv() -> None:
+    from dotenv import load_dotenv
 
-class Config:
-    OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
-    OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    load_dotenv(ENV_FILE)
 
-    MCP_SERVER_URL: str = os.getenv("MCP_SERVER_URL", "")
-    MCP_TIMEOUT: float = float(os.getenv("MCP_TIMEOUT", "30"))
 
-    APP_HOST: str = os.getenv("APP_HOST", "0.0.0.0")
-    APP_PORT: int = int(os.getenv("APP_PORT", "8000"))
-    APP_TITLE: str = os.getenv("APP_TITLE", "Customer Support Chatbot")
+def _load_environment() -> None:
+    """Apply the compiled .env cache, falling back to dotenv when it is stale"""
+    # Production containers receive their variables from the orchestrator, and
+    # prefork workers read the settings snapshot published by the parent
+    if (
+        os.environ.get("APP_ENV", "development") != "development"
+        or SNAPSHOT_ENV_VAR in os.environ
+    ):
+        return
 
-    INTENT_CONFIDENCE_THRESHOLD: float = float(
-        os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.7")
-    )
-    INTENT_MAX_TOKENS: int = int(os.getenv("INTENT_MAX_TOKENS", "150"))
-    INTENT_TEMPERATURE: float = float(os.getenv("INTENT_TEMPERATURE", "0.1"))
-
-    CHAR_STREAMING_THRESHOLD: int = int(os.getenv("CHAR_STREAMING_THRESHOLD", "200"))
-    WORD_STREAMING_THRESHOLD: int = int(os.getenv("WORD_STREAMING_THRESHOLD", "1000"))
-    CHAR_STREAM_DELAY: float = float(os.getenv("CHAR_STREAM_DELAY", "0.04"))
-    WORD_STREAM_DELAY: float = float(os.getenv("WORD_STREAM_DELAY", "0.08"))
-    LINE_STREAM_DELAY: float = float(os.getenv("LINE_STREAM_DELAY", "0.1"))
-
-    MAX_PRODUCTS_DISPLAY: int = int(os.getenv("MAX_PRODUCTS_DISPLAY", "8"))
-    PRODUCT_TRUNCATION_ENABLED: bool = (
-        os.getenv("PRODUCT_TRUNCATION_ENABLED", "true").lower() == "true"
+    try:
+        from _env_compiled import ENV, SOURCE_MTIME
+    except ImportError:
+        _load_dotenv()
+        return
+
+    try:
+        stale = ENV_FILE.stat().st_mtime != SOURCE_MTIME
+    except FileNotFoundError:
+        stale = False
+    if stale:
+        _load_dotenv()
+        return
+
+    for key, value in ENV.items():
+        os.environ.setdefault(key, value)
+
+
+_load_environment()
+
+
+_TRUE_VALUES: Final[FrozenSet[str]] = frozenset({"true", "1", "yes", "on"})
+
+
+def _parse_bool(value: str) -> bool:
+    # Canonical lowercase spellings match without allocating a lowered copy
+    return value in _TRUE_VALUES or value.lower() in _TRUE_VALUES
+
+
+_SETTINGS_SPEC: Tuple[Tuple[str, Callable[[str], Any], Any], ...] = (
+    ("OPENAI_API_KEY", str, ""),
+    ("OPENAI_MODEL", str, "gpt-4o-mini"),
+    ("OPENAI_MAX_CONNECTIONS", int, 200),
+    ("OPENAI_MAX_KEEPALIVE", int, 100),
+    ("MCP_SERVER_URL", str, ""),
+    ("MCP_TIMEOUT", float, 30.0),
+    ("MCP_MAX_CONNECTIONS", int, 1000),
+    ("MCP_MAX_KEEPALIVE", int, 100),
+    ("MCP_KEEPALIVE_EXPIRY", float, 60.0),
+    ("MCP_TRANSPORT", str, "httpx"),
+    ("MCP_HTTP2", _parse_bool, True),
+    ("APP_HOST", str, "0.0.0.0"),
+    ("APP_PORT", int, 8000),
+    ("APP_WORKERS", int, 1),
+    ("APP_TITLE", str, "Customer Support Chatbot"),
+    ("LOG_LEVEL", str, "INFO"),
+    ("AUTH_MAX_FAILURES", int, 5),
+    ("AUTH_LOCKOUT_SECONDS", float, 60.0),
+    ("INTENT_CONFIDENCE_THRESHOLD", float, 0.7),
+    ("INTENT_MAX_TOKENS", int, 60),
+    ("INTENT_TEMPERATURE", float, 0.1),
+    ("INTENT_BATCH_SIZE", int, 1),
+    ("INTENT_BATCH_WINDOW_MS", float, 50.0),
+    ("LOCAL_INTENT_MODEL", str, ""),
+    ("LOCAL_INTENT_TOKENIZER", str, ""),
+    ("LOCAL_INTENT_THRESHOLD", float, 0.6),
+    ("CHAR_STREAMING_THRESHOLD", int, 200),
+    ("WORD_STREAMING_THRESHOLD", int, 1000),
+    ("CHAR_STREAM_DELAY", float, 0.0),
+    ("WORD_STREAM_DELAY", float, 0.0),
+    ("LINE_STREAM_DELAY", float, 0.0),
+    ("STREAM_CHUNK_SIZE", int, 512),
+    ("STREAM_BURST", int, 10),
+    ("MAX_PRODUCTS_DISPLAY", int, 8),
+    ("PRODUCT_TRUNCATION_ENABLED", _parse_bool, True),
+    ("LANGFUSE_PUBLIC_KEY", str, ""),
+    ("LANGFUSE_SECRET_KEY", str, ""),
+    ("LANGFUSE_HOST", str, "https://cloud.langfuse.com"),
+    ("LANGFUSE_FLUSH_AT", int, 64),
+    ("LANGFUSE_FLUSH_INTERVAL", float, 0.5),
+    ("RESPONSE_CACHE_SIZE", int, 10_000),
+    ("RESPONSE_CACHE_TTL", float, 3600.0),
+    ("CUSTOMER_INFO_TTL", float, 300.0),
+    ("SEMANTIC_CACHE_ENABLED", _parse_bool, False),
+    ("SEMANTIC_CACHE_SIZE", int, 1000),
+    ("SEMANTIC_CACHE_THRESHOLD", float, 0.92),
+    ("EMBEDDING_MODEL", str, "text-embedding-3-small"),
+)
+
+
+_REQUIRED_SETTINGS: Final[Tuple[str, ...]] = ("OPENAI_API_KEY", "MCP_SERVER_URL")
+
+
+@functools.lru_cache(maxsize=256)
+def _convert(parse: Callable[[str], Any], raw: str) -> Any:
+    return parse(raw)
+
+
+def _parse_settings() -> Mapping[str, Any]:
+    """Parse settings once; typed defaults skip conversion for unset variables"""
+    environ = os.environ
+    return MappingProxyType(
+        {
+            name: _convert(parse, environ[name]) if name in environ else default
+            for name, parse, default in _SETTINGS_SPEC
+        }
     )
 
-    LANGFUSE_PUBLIC_KEY: str = os.getenv("LANGFUSE_PUBLIC_KEY", "")
-    LANGFUSE_SECRET_KEY: str = os.getenv("LANGFUSE_SECRET_KEY", "")
-    LANGFUSE_HOST: str = os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")
 
-    @classmethod
-    def langfuse_configured(cls) -> bool:
-        return bool(cls.LANGFUSE_PUBLIC_KEY and cls.LANGFUSE_SECRET_KEY)
+@dataclass(frozen=True, slots=True)
+class Config:
+    # Secrets stay out of the generated repr, and with it out of logs
+    OPENAI_API_KEY: str = field(repr=False)
+    OPENAI_MODEL: str
+    OPENAI_MAX_CONNECTIONS: int
+    OPENAI_MAX_KEEPALIVE: int
+
+    MCP_SERVER_URL: str
+    MCP_TIMEOUT: float
+    MCP_MAX_CONNECTIONS: int
+    MCP_MAX_KEEPALIVE: int
+    MCP_KEEPALIVE_EXPIRY: float
+    MCP_TRANSPORT: str
+    MCP_HTTP2: bool
+
+    APP_HOST: str
+    APP_PORT: int
+    APP_WORKERS: int
+    APP_TITLE: str
+    LOG_LEVEL: str
+
+    AUTH_MAX_FAILURES: int
+    AUTH_LOCKOUT_SECONDS: float
+
+    INTENT_CONFIDENCE_THRESHOLD: float
+    INTENT_MAX_TOKENS: int
+    INTENT_TEMPERATURE: float
+    INTENT_BATCH_SIZE: int
+    INTENT_BATCH_WINDOW_MS: float
+    LOCAL_INTENT_MODEL: str
+    LOCAL_INTENT_TOKENIZER: str
+    LOCAL_INTENT_THRESHOLD: float
+
+    CHAR_STREAMING_THRESHOLD: int
+    WORD_STREAMING_THRESHOLD: int
+    CHAR_STREAM_DELAY: float
+    WORD_STREAM_DELAY: float
+    LINE_STREAM_DELAY: float
+    STREAM_CHUNK_SIZE: int
+    STREAM_BURST: int
+
+    MAX_PRODUCTS_DISPLAY: int
+    PRODUCT_TRUNCATION_ENABLED: bool
+
+    LANGFUSE_PUBLIC_KEY: str
+    LANGFUSE_SECRET_KEY: str = field(repr=False)
+    LANGFUSE_HOST: str
+    LANGFUSE_FLUSH_AT: int
+    LANGFUSE_FLUSH_INTERVAL: float
+
+    RESPONSE_CACHE_SIZE: int
+    RESPONSE_CACHE_TTL: float
+    CUSTOMER_INFO_TTL: float
+    SEMANTIC_CACHE_ENABLED: bool
+    SEMANTIC_CACHE_SIZE: int
+    SEMANTIC_CACHE_THRESHOLD: float
+    EMBEDDING_MODEL: str
 
     @classmethod
-    def validate(cls) -> bool:
-        required_vars = ["OPENAI_API_KEY", "MCP_SERVER_URL"]
-        missing = [var for var in required_vars if not getattr(cls, var)]
+    def from_env(cls) -> "Config":
+        return cls(**_parse_settings())
+
+    def langfuse_configured(self) -> bool:
+        return bool(self.LANGFUSE_PUBLIC_KEY and self.LANGFUSE_SECRET_KEY)
+
+    def validate(self) -> bool:
+        missing = tuple(name for name in _REQUIRED_SETTINGS if not getattr(self, name))
         if missing:
             raise ValueError(
                 f"Missing required environment variables: {', '.join(missing)}"
@@ -53,52 +202,162 @@ class Config:
         return True
 
 
-CUSTOMERS: Dict[str, str] = {
-    "donaldgarcia@example.net": "7912",
-    "michellejames@example.com": "1520",
-    "laurahenderson@example.org": "1488",
-    "spenceamanda@example.org": "2535",
-    "glee@example.net": "4582",
-    "williamsthomas@example.net": "4811",
-    "justin78@example.net": "9279",
-    "jason31@example.com": "1434",
-    "samuel81@example.com": "4257",
-    "williamleon@example.net": "9928",
-}
+# Built on first access by __getattr__ and then memoized as real globals, so
+# importing only the static tables below never parses the environment. Every
+# name in _SETTINGS_SPEC except the secrets is exported the same way; those
+# are only reachable through CONFIG, which keeps them out of its repr.
+_PARSED: Mapping[str, Any]
+CONFIG: Config
 
-INTENT_CATEGORIES = [
-    "SEARCH_PRODUCTS",
-    "ORDER_STATUS",
-    "PLACE_ORDER",
-    "WARRANTY_SUPPORT",
-    "TECH_SUPPORT",
-    "GREETING",
-    "ACCOUNT_INFO",
-    "OTHER",
-]
+_SECRET_SETTINGS: Final[FrozenSet[str]] = frozenset(
+    {"OPENAI_API_KEY", "LANGFUSE_SECRET_KEY"}
+)
+_SETTING_NAMES: Final[FrozenSet[str]] = (
+    frozenset(name for name, _, _ in _SETTINGS_SPEC) - _SECRET_SETTINGS
+)
+
+
+def _store(parsed: Mapping[str, Any]) -> Config:
+    config = Config(**parsed)
+    # Settings become real globals so `from config import APP_PORT` binds a
+    # plain constant and later module reads skip __getattr__
+    globals().update(
+        {name: parsed[name] for name in _SETTING_NAMES}, _PARSED=parsed, CONFIG=config
+    )
+    return config
+
+
+def _settings() -> Mapping[str, Any]:
+    parsed = globals().get("_PARSED")
+    if parsed is None:
+        snapshot = os.environ.get(SNAPSHOT_ENV_VAR)
+        parsed = _read_settings_snapshot(snapshot) if snapshot else _parse_settings()
+        _store(parsed)
+    return parsed
+
+
+def publish_settings_snapshot() -> shared_memory.SharedMemory:
+    """Share the parsed settings with prefork workers through shared memory
+
+    The caller owns the block and must close() and unlink() it on shutdown.
+    """
+    blob = json.dumps(dict(_settings())).encode()
+    shm = shared_memory.SharedMemory(create=True, size=len(blob))
+    shm.buf[: len(blob)] = blob
+    os.environ[SNAPSHOT_ENV_VAR] = shm.name
+    return shm
+
+
+def _read_settings_snapshot(name: str) -> Mapping[str, Any]:
+    # Workers spawned by the publisher share its resource tracker, so
+    # attaching here does not take over ownership of the block
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return MappingProxyType(json.loads(bytes(shm.buf).rstrip(b"\0")))
+    finally:
+        shm.close()
 
-MCP_TOOLS = {
+
+def __getattr__(name: str) -> Any:
+    """Resolve CONFIG and individual settings (config.APP_PORT) on demand"""
+    if name == "_PARSED":
+        return _settings()
+    if name == "CONFIG":
+        _settings()
+        return globals()["CONFIG"]
+    if name in _SETTING_NAMES:
+        return _settings()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+CUSTOMERS: Mapping[str, str] = MappingProxyType(
+    {
+        "donaldgarcia@example.net": "7912",
+        "michellejames@example.com": "1520",
+        "laurahenderson@example.org": "1488",
+        "spenceamanda@example.org": "2535",
+        "glee@example.net": "4582",
+        "williamsthomas@example.net": "4811",
+        "justin78@example.net": "9279",
+        "jason31@example.com": "1434",
+        "samuel81@example.com": "4257",
+        "williamleon@example.net": "9928",
+    }
+)
+
+# Column layout of CUSTOMERS for scans; CUSTOMER_INDEX maps email -> row
+CUSTOMER_EMAILS: Final[Tuple[str, ...]] = tuple(CUSTOMERS)
+CUSTOMER_PINS: Final[Tuple[str, ...]] = tuple(CUSTOMERS.values())
+CUSTOMER_INDEX: Final[Mapping[str, int]] = MappingProxyType(
+    {email: row for row, email in enumerate(CUSTOMER_EMAILS)}
+)
+
+INTENT_CATEGORIES: Final[Tuple[str, ...]] = tuple(
+    map(
+        sys.intern,
+        (
+            "SEARCH_PRODUCTS",
+            "ORDER_STATUS",
+            "PLACE_ORDER",
+            "WARRANTY_SUPPORT",
+            "TECH_SUPPORT",
+            "GREETING",
+            "ACCOUNT_INFO",
+            "OTHER",
+        ),
+    )
+)
+INTENT_CATEGORY_SET: Final[FrozenSet[str]] = frozenset(INTENT_CATEGORIES)
+
+_MCP_TOOL_SPECS = {
     "verify_customer_pin": {
         "description": "Verify customer email/PIN and get customer ID",
-        "params": ["email", "pin"],
+        "params": ("email", "pin"),
     },
     "get_customer": {
         "description": "Get detailed customer information",
-        "params": ["customer_id"],
+        "params": ("customer_id",),
+    },
+    "list_products": {
+        "description": "Browse product catalog",
+        "params": ("category",),
+    },
+    "search_products": {
+        "description": "Search products by query",
+        "params": ("query",),
     },
-    "list_products": {"description": "Browse product catalog", "params": ["category"]},
-    "search_products": {"description": "Search products by query", "params": ["query"]},
     "get_product": {
         "description": "Get specific product details",
-        "params": ["product_id"],
+        "params": ("product_id",),
     },
     "list_orders": {
         "description": "Get customer's order history",
-        "params": ["customer_id"],
+        "params": ("customer_id",),
+    },
+    "get_order": {
+        "description": "Get specific order details",
+        "params": ("order_id",),
     },
-    "get_order": {"description": "Get specific order details", "params": ["order_id"]},
     "create_order": {
         "description": "Place new order",
-        "params": ["customer_id", "product_id", "quantity"],
+        "params": ("customer_id", "product_id", "quantity"),
     },
 }
+
+MCP_TOOLS: Mapping[str, Mapping[str, Any]] = MappingProxyType(
+    {name: MappingProxyType(tool) for name, tool in _MCP_TOOL_SPECS.items()}
+)
+
+__all__ = [
+    "CONFIG",
+    "CUSTOMERS",
+    "CUSTOMER_EMAILS",
+    "CUSTOMER_INDEX",
+    "CUSTOMER_PINS",
+    "Config",
+    "INTENT_CATEGORIES",
+    "INTENT_CATEGORY_SET",
+    "MCP_TOOLS",
+    "publish_settings_snapshot",
+    *sorted(_SETTING_NAMES),
+]
@@ -1,30 +1,45 @@
+import asyncio
+import functools
+import re
+import sys
 from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, Dict
 
 import uvicorn
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from langfuse import observe
 from loguru import logger
 
-from config import CUSTOMERS, Config
+from config import CONFIG, CUSTOMERS, publish_settings_snapshot
+from services.auth import login_throttle, verify_pin
 from services.intent_classifier import IntentClassifier
-from services.mcp_client import MCPClient
+from services.langfuse_client import langfuse_client
+from services.mcp_client import MCP_TOOLS_ETAG, MCP_TOOLS_JSON, MCPClient
 from services.streaming import StreamingService, get_simple_response
 
+# Formatting and writing happen on loguru's worker thread, not the event loop
+logger.remove()
+logger.add(sys.stderr, level=CONFIG.LOG_LEVEL, enqueue=True)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting application...")
-    Config.validate()
+    CONFIG.validate()
     yield
     # Shutdown
     logger.info("Shutting down application...")
+    await mcp_client.aclose()
+    await intent_classifier.aclose()
+    # Spans are exported in the background; drain what is left before exit
+    await asyncio.to_thread(langfuse_client.flush)
 
 
 app = FastAPI(
-    title=Config.APP_TITLE,
+    title=CONFIG.APP_TITLE,
     version="2.0.0",
     lifespan=lifespan,
 )
@@ -40,104 +55,8 @@ intent_classifier = IntentClassifier()
 mcp_client = MCPClient()
 streaming_service = StreamingService()
 
-
-@app.post("/auth")
-async def authenticate(request: Request):
-    data = await request.json()
-    email, pin = data.get("email"), data.get("pin")
-    is_valid = bool(email and pin and CUSTOMERS.get(email) == pin)
-    return {"success": is_valid, "customer": email if is_valid else None}
-
-
-@app.get("/chat/{customer}")
-@observe(name="chat-interaction", capture_input=False, capture_output=False)
-async def chat_stream(customer: str, message: str, request: Request):
-    async def event_generator():
-        if await request.is_disconnected():
-            return
-
-        response = "I can help with orders, products, warranties, and technical issues. What do you need?"
-        intent = "OTHER"
-        confidence = 0.5
-        entities = []
-
-        try:
-            intent_result = await intent_classifier.classify_intent(message, customer)
-            intent = intent_result.get("intent", "OTHER")
-            entities = intent_result.get("entities", [])
-            confidence = intent_result.get("confidence", 0.5)
-
-            logger.info(f"Intent: {intent} (confidence: {confidence})")
-            response = get_simple_response(message, customer)
-            mcp_intents = [
-                "SEARCH_PRODUCTS",
-                "ORDER_STATUS",
-                "PLACE_ORDER",
-                "WARRANTY_SUPPORT",
-                "ACCOUNT_INFO",
-            ]
-            if (
-                intent in mcp_intents
-                and confidence > Config.INTENT_CONFIDENCE_THRESHOLD
-            ):
-                logger.info(f"MCP routing for intent: {intent}")
-
-                try:
-                    tool_msg, direct_response = await mcp_client.route_intent_to_mcp(
-                        intent, entities, message, customer
-                    )
-
-                    if direct_response:
-                        response = direct_response
-                    elif tool_msg:
-                        mcp_result = await mcp_client.execute_mcp_call(tool_msg)
-                        response = mcp_result.get("content") or mcp_result.get(
-                            "error", response
-                        )
-                except Exception as e:
-                    logger.error(f"MCP routing error: {e}")
-                    response = "An unexpected error occurred. Please try again or contact support if this continues."
-
-            async for chunk in streaming_service.stream_response(
-                response, request, intent
-            ):
-                yield chunk
-
-        except Exception as e:
-            logger.error(f"Chat error: {e}")
-            error_response = (
-                "I'm experiencing technical difficulties. Please try again."
-            )
-            async for chunk in streaming_service.stream_response(
-                error_response, request
-            ):
-                yield chunk
-
-    headers = {
-        "Cache-Control": "no-cache",
-        "Connection": "keep-alive",
-        "X-Accel-Buffering": "no",
-    }
-
-    async def generate():
-        async for chunk in event_generator():
-            yield f"data: {chunk['data']}\n\n"
-        yield "data: [DONE]\n\n"
-
-    return StreamingResponse(
-        generate(), media_type="text/event-stream", headers=headers
-    )
-
-
-@app.get("/test")
-async def test_page():
-    with open("test.html") as f:
-        return HTMLResponse(f.read())
-
-
-@app.get("/", response_class=HTMLResponse)
-async def get_chat_ui():
-    return """<!DOCTYPE html>
+# Encoded once at import; the page is static
+INDEX_HTML = """<!DOCTYPE html>
 <html><head><title>Customer Support Chat</title><style>
 body{font-family:Arial;max-width:600px;margin:50px auto;padding:20px}
 .auth,.chat{margin:20px 0}.hidden{display:none}
@@ -145,7 +64,7 @@ input,button{padding:10px;margin:5px;border:1px solid #ccc;border-radius:5px}
 #messages{height:400px;border:1px solid #ccc;padding:10px;overflow-y:scroll;background:#f9f9f9}
 .message{margin:10px 0;padding:10px;border-radius:10px}
 .user{background:#007bff;color:white;text-align:right}.bot{background:#e9ecef}
-</style></head><body>
+</style></head><body data-typewriter-ms="15">
 <h1>🤖 Customer Support</h1>
 <div class="auth" id="auth">
 <input type="email" id="email" placeholder="Email" required>
@@ -170,15 +89,20 @@ async function sendMessage(){
 const input=document.getElementById('messageInput');
 const message=input.value.trim();if(!message)return;
 addMessage(message,'user');input.value='';
-const eventSource=new EventSource(`/chat/${encodeURIComponent(customer)}?message=${encodeURIComponent(message)}`);
-let botMessage='';
-console.log('Starting EventSource for:', message);
-eventSource.onopen=()=>console.log('EventSource opened');
-eventSource.onmessage=function(event){
-console.log('Received:', event.data);
-if(event.data==='[DONE]'){console.log('Stream ended');eventSource.close();return;}
-botMessage+=event.data;updateBotMessage(botMessage);};
-eventSource.onerror=(e)=>{console.error('EventSource error:',e);eventSource.close();};}
+const ws=getSocket();
+if(ws.readyState===WebSocket.OPEN)ws.send(message);
+else ws.addEventListener('open',()=>ws.send(message),{once:true});}
+function getSocket(){
+if(window.ws&&window.ws.readyState<=WebSocket.OPEN)return window.ws;
+const proto=location.protocol==='https:'?'wss':'ws';
+const ws=new WebSocket(`${proto}://${location.host}/ws/${encodeURIComponent(customer)}`);
+let write=null;
+ws.onmessage=function(event){
+if(event.data==='[DONE]'){write=null;return;}
+if(!write)write=typewriter();
+write(event.data);};
+ws.onerror=(e)=>console.error('WebSocket error:',e);
+window.ws=ws;return ws;}
 function addMessage(text,type){
 const messages=document.getElementById('messages');
 const div=document.createElement('div');
@@ -186,12 +110,200 @@ div.className=`message ${type}`;
 div.textContent=text;
 messages.appendChild(div);
 messages.scrollTop=messages.scrollHeight;}
-function updateBotMessage(text){
+function typewriter(){
 const messages=document.getElementById('messages');
-let lastBot=messages.querySelector('.message.bot:last-child');
-if(!lastBot){lastBot=document.createElement('div');lastBot.className='message bot';messages.appendChild(lastBot);}
-lastBot.textContent=text;messages.scrollTop=messages.scrollHeight;}
-</script></body></html>"""
+const ms=Number(document.body.dataset.typewriterMs)||0;
+const div=document.createElement('div');div.className='message bot';messages.appendChild(div);
+let queue='',timer=null;
+function tick(){
+const n=ms?1:queue.length;div.textContent+=queue.slice(0,n);queue=queue.slice(n);
+messages.scrollTop=messages.scrollHeight;timer=queue?setTimeout(tick,ms):null;}
+return function(text){queue+=text;if(!timer)tick();};}
+</script></body></html>""".encode()
+INDEX_HEADERS = {
+    "Content-Type": "text/html; charset=utf-8",
+    "Cache-Control": "public, max-age=3600",
+}
+
+
+@app.post("/auth")
+async def authenticate(request: Request):
+    data = await request.json()
+    email, pin = data.get("email"), data.get("pin")
+    if isinstance(email, str) and login_throttle.is_locked(email):
+        return JSONResponse(
+            status_code=429,
+            content={"success": False, "customer": None, "error": "Too many attempts"},
+        )
+    is_valid = verify_pin(email, pin)
+    if isinstance(email, str):
+        login_throttle.record(email, is_valid)
+    return {"success": is_valid, "customer": email if is_valid else None}
+
+
+# Intents answered from the MCP server rather than a canned reply
+MCP_INTENTS = frozenset(
+    {
+        "SEARCH_PRODUCTS",
+        "ORDER_STATUS",
+        "PLACE_ORDER",
+        "WARRANTY_SUPPORT",
+        "ACCOUNT_INFO",
+    }
+)
+
+# Keyword guesses for intents whose MCP routing ignores entities for known
+# customers, so the routing call can run while the classifier is still in
+# flight. Unknown customers fall back to a listing picked from the entities,
+# so they are never guessed for.
+_SPECULATIVE_INTENTS = (
+    ("ORDER_STATUS", re.compile(r"\b(order|status|track)\b", re.IGNORECASE)),
+    ("ACCOUNT_INFO", re.compile(r"\baccount\b", re.IGNORECASE)),
+)
+# "order a laptop" is a purchase, not a lookup; a wrong guess costs an MCP call
+_PURCHASE_RE = re.compile(r"\b(buy|purchase|order (a|an|some))\b", re.IGNORECASE)
+
+
+def _guess_intent(message: str) -> str | None:
+    if _PURCHASE_RE.search(message):
+        return None
+    for intent, pattern in _SPECULATIVE_INTENTS:
+        if pattern.search(message):
+            return intent
+    return None
+
+
+def _discard(task: asyncio.Task) -> None:
+    """Cancel an unused speculative task without leaking its exception"""
+    if not task.cancel() and not task.cancelled():
+        task.exception()
+
+
+_SSE_DONE = b"data: [DONE]\n\n"
+
+
+def _sse_frame(data: str) -> bytes:
+    """Encode one chunk as an SSE event, one data field per line"""
+    return b"data: " + data.encode().replace(b"\n", b"\ndata: ") + b"\n\n"
+
+
+async def handle_turn(
+    customer: str, message: str, request: Request | None = None
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Classify one chat message, route it and stream the reply chunks"""
+    if request is not None and await request.is_disconnected():
+        return
+
+    response = "I can help with orders, products, warranties, and technical issues. What do you need?"
+    intent = "OTHER"
+    confidence = 0.5
+    entities = []
+
+    intent_task = asyncio.create_task(
+        intent_classifier.classify_intent(message, customer)
+    )
+    guess = _guess_intent(message) if customer in CUSTOMERS else None
+    prefetch = (
+        asyncio.create_task(
+            mcp_client.route_intent_to_mcp(guess, [], message, customer)
+        )
+        if guess
+        else None
+    )
+
+    try:
+        intent_result = await intent_task
+        intent = intent_result.get("intent", "OTHER")
+        entities = intent_result.get("entities", [])
+        confidence = intent_result.get("confidence", 0.5)
+
+        logger.info(f"Intent: {intent} (confidence: {confidence})")
+        response = get_simple_response(message, customer)
+        if intent in MCP_INTENTS and confidence > CONFIG.INTENT_CONFIDENCE_THRESHOLD:
+            logger.info(f"MCP routing for intent: {intent}")
+
+            try:
+                if prefetch is not None and intent == guess:
+                    routed, prefetch = prefetch, None
+                    tool_msg, direct_response = await routed
+                else:
+                    tool_msg, direct_response = await mcp_client.route_intent_to_mcp(
+                        intent, entities, message, customer
+                    )
+
+                if direct_response:
+                    response = direct_response
+                elif tool_msg:
+                    mcp_result = await mcp_client.execute_mcp_call(tool_msg)
+                    response = mcp_result.get("content") or mcp_result.get(
+                        "error", response
+                    )
+            except Exception as e:
+                logger.error(f"MCP routing error: {e}")
+                response = "An unexpected error occurred. Please try again or contact support if this continues."
+
+        async for chunk in streaming_service.stream_response(response, request, intent):
+            yield chunk
+
+    except Exception as e:
+        logger.error(f"Chat error: {e}")
+        error_response = "I'm experiencing technical difficulties. Please try again."
+        async for chunk in streaming_service.stream_response(error_response, request):
+            yield chunk
+
+    finally:
+        intent_task.cancel()
+        if prefetch is not None:
+            _discard(prefetch)
+
+
+@app.get("/chat/{customer}")
+@observe(name="chat-interaction", capture_input=False, capture_output=False)
+async def chat_stream(customer: str, message: str, request: Request):
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "X-Accel-Buffering": "no",
+    }
+
+    async def generate():
+        async for chunk in handle_turn(customer, message, request):
+            yield _sse_frame(chunk["data"])
+        yield _SSE_DONE
+
+    return StreamingResponse(
+        generate(), media_type="text/event-stream", headers=headers
+    )
+
+
+@app.websocket("/ws/{customer}")
+async def chat_websocket(websocket: WebSocket, customer: str):
+    """Serve every turn of a chat session over one persistent connection"""
+    await websocket.accept()
+    try:
+        while True:
+            message = await websocket.receive_text()
+            async for chunk in handle_turn(customer, message):
+                await websocket.send_text(chunk["data"])
+    except WebSocketDisconnect:
+        logger.info(f"WebSocket closed for {customer}")
+
+
+@functools.lru_cache(maxsize=1)
+def _test_page() -> bytes:
+    with open("test.html", "rb") as f:
+        return f.read()
+
+
+@app.get("/test")
+async def test_page():
+    # Only the first request touches the disk; keep that read off the loop
+    return HTMLResponse(await asyncio.to_thread(_test_page))
+
+
+@app.get("/", response_class=HTMLResponse)
+async def get_chat_ui():
+    return Response(content=INDEX_HTML, headers=INDEX_HEADERS)
 
 
 @app.get("/health")
@@ -202,12 +314,50 @@ async def health_check():
 @app.get("/config")
 async def get_config():
     return {
-        "app_title": Config.APP_TITLE,
-        "intent_threshold": Config.INTENT_CONFIDENCE_THRESHOLD,
+        "app_title": CONFIG.APP_TITLE,
+        "intent_threshold": CONFIG.INTENT_CONFIDENCE_THRESHOLD,
         "streaming_enabled": True,
-        "mcp_server_connected": bool(Config.MCP_SERVER_URL),
+        "mcp_server_connected": bool(CONFIG.MCP_SERVER_URL),
+        "cache": {
+            "intent": intent_classifier.cache.stats(),
+            "tools": mcp_client.cache.stats(),
+            "semantic": (
+                intent_classifier.semantic_cache.stats()
+                if intent_classifier.semantic_cache is not None
+                else None
+            ),
+        },
     }
 
 
+@app.get("/tools")
+async def get_tools(request: Request):
+    headers = {"ETag": MCP_TOOLS_ETAG, "Cache-Control": "public, max-age=3600"}
+    if request.headers.get("if-none-match") == MCP_TOOLS_ETAG:
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=MCP_TOOLS_JSON, media_type="application/json", headers=headers
+    )
+
+
 if __name__ == "__main__":
-    uvicorn.run(app, host=Config.APP_HOST, port=Config.APP_PORT, log_level="info")
+    settings_snapshot = publish_settings_snapshot()
+    try:
+        # Workers need an import string; each one rebuilds CONFIG from the
+        # shared snapshot instead of re-reading the environment
+        uvicorn.run(
+            "main:app",
+            host=CONFIG.APP_HOST,
+            port=CONFIG.APP_PORT,
+            workers=CONFIG.APP_WORKERS,
+            # uvloop has no Windows build, so uvicorn[standard] skips it there
+            loop="asyncio" if sys.platform == "win32" else "uvloop",
+            http="httptools",
+            proxy_headers=True,
+            log_level=CONFIG.LOG_LEVEL.lower(),
+            # One formatted line per request adds up; errors still log
+            access_log=False,
+        )
+    finally:
+        settings_snapshot.close()
+        settings_snapshot.unlink()
@@ -0,0 +1,30 @@
+"""Compile .env into an importable module so startup can skip dotenv parsing"""
+import sys
+from pathlib import Path
+
+from dotenv import dotenv_values
+
+ROOT = Path(__file__).resolve().parent.parent
+ENV_FILE = ROOT / ".env"
+OUTPUT_FILE = ROOT / "_env_compiled.py"
+
+
+def compile_env(env_file: Path = ENV_FILE, output_file: Path = OUTPUT_FILE) -> int:
+    values = {
+        key: value
+        for key, value in dotenv_values(env_file).items()
+        if value is not None
+    }
+    output_file.write_text(
+        '"""Generated by scripts/compile_env.py - do not edit"""\n'
+        f"SOURCE_MTIME = {env_file.stat().st_mtime!r}\n"
+        f"ENV = {values!r}\n"
+    )
+    return len(values)
+
+
+if __name__ == "__main__":
+    if not ENV_FILE.exists():
+        sys.exit(f"{ENV_FILE} not found")
+    count = compile_env()
+    print(f"Compiled {count} variables into {OUTPUT_FILE.name}")
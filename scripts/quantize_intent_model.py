@@ -0,0 +1,27 @@
+"""Quantize the local intent model to INT8 for faster CPU inference"""
+import sys
+from pathlib import Path
+from typing import Optional
+
+from onnxruntime.quantization import QuantType, quantize_dynamic
+
+
+def quantize_model(model_file: Path, output_file: Optional[Path] = None) -> Path:
+    # Dynamic quantization stores INT8 weights and quantizes activations at
+    # run time, so no calibration data is needed
+    output_file = output_file or model_file.with_suffix(".int8.onnx")
+    quantize_dynamic(model_file, output_file, weight_type=QuantType.QInt8)
+    return output_file
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python scripts/quantize_intent_model.py MODEL.onnx")
+    model_file = Path(sys.argv[1])
+    if not model_file.exists():
+        sys.exit(f"{model_file} not found")
+    output_file = quantize_model(model_file)
+    print(
+        f"Wrote {output_file.name}: {model_file.stat().st_size} -> "
+        f"{output_file.stat().st_size} bytes"
+    )
@@ -0,0 +1,71 @@
+"""Customer PIN verification against salted digests"""
+import hashlib
+import hmac
+import os
+from types import MappingProxyType
+from typing import Any, Collection, FrozenSet, Mapping
+
+from config import CONFIG, CUSTOMER_EMAILS, CUSTOMER_PINS
+from services.response_cache import TTLCache
+
+_PIN_SALT = os.urandom(16)
+
+
+def _pin_digest(email: str, pin: str) -> bytes:
+    return hashlib.sha256(_PIN_SALT + email.encode() + b"\0" + pin.encode()).digest()
+
+
+PIN_DIGESTS: Mapping[str, bytes] = MappingProxyType(
+    {
+        email: _pin_digest(email, pin)
+        for email, pin in zip(CUSTOMER_EMAILS, CUSTOMER_PINS)
+    }
+)
+
+
+def verify_pin(email: Any, pin: Any) -> bool:
+    """Check a customer's PIN in constant time"""
+    if not isinstance(email, str) or not isinstance(pin, str):
+        return False
+    stored = PIN_DIGESTS.get(email)
+    if stored is None:
+        return False
+    return hmac.compare_digest(stored, _pin_digest(email, pin))
+
+
+class LoginThrottle:
+    """Lock an email out after repeated failed PIN attempts
+
+    Each failure refreshes the entry's TTL, so the lockout lifts only once
+    ``lockout`` seconds pass without another failed attempt. Counts are kept
+    in process memory, so every uvicorn worker throttles independently.
+
+    Only ``accounts`` are tracked and the cache holds one slot per account,
+    so failures for made-up emails can never evict a real customer's count.
+    """
+
+    def __init__(self, max_failures: int, lockout: float, accounts: Collection[str]):
+        self.max_failures = max_failures
+        self.accounts: FrozenSet[str] = frozenset(accounts)
+        self._failures = TTLCache(len(self.accounts), lockout)
+
+    def is_locked(self, email: str) -> bool:
+        if self.max_failures <= 0:
+            return False
+        return (self._failures.get(email) or 0) >= self.max_failures
+
+    def record(self, email: str, success: bool) -> None:
+        if email not in self.accounts:
+            return
+        if success:
+            self._failures.set(email, 0)
+        else:
+            self._failures.set(email, (self._failures.get(email) or 0) + 1)
+
+    def clear(self) -> None:
+        self._failures.clear()
+
+
+login_throttle = LoginThrottle(
+    CONFIG.AUTH_MAX_FAILURES, CONFIG.AUTH_LOCKOUT_SECONDS, PIN_DIGESTS
+)
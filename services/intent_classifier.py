@@ -1,50 +1,348 @@
+import asyncio
 import json
-from typing import Any, Dict
+import re
+import sys
+from typing import Any, Dict, List, Optional, Set, Tuple
 
+import httpx
 from langfuse import observe
 from loguru import logger
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from openai.types.shared_params import ResponseFormatJSONSchema
+from pydantic import BaseModel, field_validator
 
-from config import INTENT_CATEGORIES, Config
+from config import CONFIG, INTENT_CATEGORIES, INTENT_CATEGORY_SET
+from services.local_intent import load_local_intent_model
+from services.response_cache import SemanticCache, TTLCache, cache_key
+
+
+class IntentResult(BaseModel):
+    """One classification as returned by the model"""
+
+    intent: str
+    confidence: float
+    entities: List[str]
+
+    @field_validator("intent")
+    @classmethod
+    def _known_intent(cls, intent: str) -> str:
+        if intent in INTENT_CATEGORY_SET:
+            # Interned so routing's == checks against literals hit the
+            # identity fast path instead of comparing characters
+            return sys.intern(intent)
+        logger.warning(f"Unknown intent from classifier: {intent}")
+        return "OTHER"
+
+
+class IntentBatchResult(BaseModel):
+    classifications: List[IntentResult]
+
+
+_FALLBACK_RESULT = {
+    "intent": "OTHER",
+    "confidence": 0.5,
+    "entities": [],
+    "reasoning": "Classification failed",
+}
+
+# Intents whose MCP routing searches with the extracted entities. A
+# paraphrase is only similar, so its entities must come from its own
+# classification rather than a semantic cache hit.
+_ENTITY_ROUTED_INTENTS = frozenset({"SEARCH_PRODUCTS", "PLACE_ORDER"})
+
+# Structured outputs replace the JSON example the prompt used to carry and
+# keep the completion to the three fields routing actually reads
+_INTENT_SCHEMA: Dict[str, object] = {
+    "type": "object",
+    "properties": {
+        "intent": {"type": "string", "enum": list(INTENT_CATEGORIES)},
+        "confidence": {"type": "number"},
+        "entities": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["intent", "confidence", "entities"],
+    "additionalProperties": False,
+}
+_INTENT_FORMAT: ResponseFormatJSONSchema = {
+    "type": "json_schema",
+    "json_schema": {"name": "intent", "strict": True, "schema": _INTENT_SCHEMA},
+}
+_BATCH_FORMAT: ResponseFormatJSONSchema = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "intents",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "classifications": {"type": "array", "items": _INTENT_SCHEMA}
+            },
+            "required": ["classifications"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Messages unambiguous enough to classify without a model call
+_SMALL_TALK_RE = re.compile(
+    r"^\s*(?:hi|hello|hey|thanks|thank you|bye|goodbye)[\s!.?]*$", re.IGNORECASE
+)
+_ORDER_NUMBER_RE = re.compile(
+    r"\border\s*(?:#|number|no\.?)\s*(\d{4,})\b", re.IGNORECASE
+)
+
+
+def _fast_path(message: str) -> Optional[Dict[str, Any]]:
+    """Classify small talk and order-number lookups by pattern alone"""
+    if _SMALL_TALK_RE.match(message):
+        return {"intent": "GREETING", "confidence": 0.99, "entities": []}
+    match = _ORDER_NUMBER_RE.search(message)
+    if match:
+        return {
+            "intent": "ORDER_STATUS",
+            "confidence": 0.95,
+            "entities": [match.group(1)],
+        }
+    return None
+
+
+_BATCH_INSTRUCTIONS = """
+The message is a JSON array of customer messages. Classify each one
+independently, returning one classification per message in the same order."""
+
+
+class IntentBatcher:
+    """Coalesce concurrent classifications into a single chat completion"""
+
+    def __init__(self, classifier: "IntentClassifier", max_size: int, window: float):
+        self.classifier = classifier
+        self.max_size = max_size
+        self.window = window
+        self.queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+    async def submit(self, message: str) -> Dict[str, Any]:
+        """Queue one message and wait for its share of the batch result"""
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.get_loop() is not loop:
+            self.queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        assert self.queue is not None
+        future: asyncio.Future[Dict[str, Any]] = loop.create_future()
+        self.queue.put_nowait((message, future))
+        return await future
+
+    async def aclose(self) -> None:
+        """Stop the collector and cancel batches still waiting on OpenAI"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        # The classifier closes its client next, so in-flight calls must not
+        # outlive this; their callers see a cancellation instead
+        inflight = list(self._inflight)
+        for task in inflight:
+            task.cancel()
+        await asyncio.gather(*inflight, return_exceptions=True)
+        while self.queue is not None and not self.queue.empty():
+            _, future = self.queue.get_nowait()
+            future.cancel()
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        assert self.queue is not None
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.window
+        while len(batch) < self.max_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            # Dispatch without waiting so the next window starts collecting now
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        messages = [message for message, _ in batch]
+        try:
+            if len(messages) == 1:
+                results = [await self.classifier._classify_one(messages[0])]
+            else:
+                results = await self.classifier._classify_batch(messages)
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
 
 
 class IntentClassifier:
+    _CATEGORY_DESCRIPTIONS: Dict[str, str] = {
+        "SEARCH_PRODUCTS": "Looking for products, browsing, specifications",
+        "ORDER_STATUS": "Checking order status, delivery, tracking",
+        "PLACE_ORDER": "Wanting to buy, purchase, order a product",
+        "WARRANTY_SUPPORT": "Warranty claims, returns, repairs",
+        "TECH_SUPPORT": "Technical issues, setup help, troubleshooting",
+        "GREETING": "Hello, hi, general greeting",
+        "ACCOUNT_INFO": "Account details, login issues, customer info",
+        "OTHER": "Anything that doesn't fit above categories",
+    }
+
     def __init__(self):
         self.client = AsyncOpenAI(
-            api_key=Config.OPENAI_API_KEY,
-            timeout=30.0,
+            api_key=CONFIG.OPENAI_API_KEY,
+            timeout=httpx.Timeout(30.0, connect=5.0),
             max_retries=3,
+            # One multiplexed pool for every classification and embedding call
+            http_client=DefaultAsyncHttpxClient(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=CONFIG.OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=CONFIG.OPENAI_MAX_KEEPALIVE,
+                    keepalive_expiry=30.0,
+                ),
+            ),
+        )
+        self.model = CONFIG.OPENAI_MODEL
+        # The categories are static, so the prompt is rendered once
+        self._system_prompt = self._build_system_prompt()
+        self.cache = TTLCache(CONFIG.RESPONSE_CACHE_SIZE, CONFIG.RESPONSE_CACHE_TTL)
+        self.batcher = (
+            IntentBatcher(
+                self, CONFIG.INTENT_BATCH_SIZE, CONFIG.INTENT_BATCH_WINDOW_MS / 1000
+            )
+            if CONFIG.INTENT_BATCH_SIZE > 1
+            else None
+        )
+        self.local_model = load_local_intent_model()
+        self.semantic_cache = (
+            SemanticCache(CONFIG.SEMANTIC_CACHE_SIZE, CONFIG.SEMANTIC_CACHE_THRESHOLD)
+            if CONFIG.SEMANTIC_CACHE_ENABLED
+            else None
         )
-        self.model = Config.OPENAI_MODEL
 
     @observe(name="intent-classification", as_type="generation")
     async def classify_intent(self, message: str, customer: str) -> Dict[str, Any]:
-        try:
-            system_prompt = self._build_system_prompt()
-            user_prompt = f"Customer: {customer}\nMessage: {message}"
-
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                max_tokens=Config.INTENT_MAX_TOKENS,
-                temperature=Config.INTENT_TEMPERATURE,
-            )
+        fast = _fast_path(message)
+        if fast is not None:
+            logger.debug("Pattern intent classification: {}", fast)
+            return fast
 
-            result: Dict[str, Any] = json.loads(response.choices[0].message.content)
-            logger.debug(f"Intent classification: {result}")
-            return result
+        key = cache_key(self.model, message.strip().lower())
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.debug("Intent cache hit")
+            return dict(cached)
 
+        if self.local_model is not None:
+            local = await asyncio.to_thread(self.local_model.predict, message)
+            if local["confidence"] >= CONFIG.LOCAL_INTENT_THRESHOLD:
+                logger.debug("Local intent classification: {}", local)
+                self.cache.set(key, local)
+                return dict(local)
+
+        embedding = None
+        if self.semantic_cache is not None:
+            embedding = await self._embed(message)
+            if embedding is not None:
+                similar = self.semantic_cache.get(embedding)
+                if similar is not None:
+                    logger.debug("Semantic intent cache hit")
+                    return dict(similar, entities=[])
+
+        try:
+            if self.batcher is not None:
+                result = await self.batcher.submit(message)
+            else:
+                result = await self._classify_one(message)
         except Exception as e:
             logger.error(f"Intent classification error: {e}")
-            return {
-                "intent": "OTHER",
-                "confidence": 0.5,
-                "entities": [],
-                "reasoning": "Classification failed",
-            }
+            return dict(_FALLBACK_RESULT)
+
+        logger.debug("Intent classification: {}", result)
+        self.cache.set(key, result)
+        if (
+            embedding is not None
+            and self.semantic_cache is not None
+            and result["intent"] not in _ENTITY_ROUTED_INTENTS
+        ):
+            # Only the label carries over to paraphrases, never the entities
+            self.semantic_cache.set(
+                embedding,
+                {"intent": result["intent"], "confidence": result["confidence"]},
+            )
+        return dict(result)
+
+    async def _embed(self, message: str) -> Optional[List[float]]:
+        """Embed a message for the semantic cache, or None if that fails"""
+        try:
+            response = await self.client.embeddings.create(
+                model=CONFIG.EMBEDDING_MODEL, input=message
+            )
+        except Exception as e:
+            logger.warning(f"Embedding failed, skipping semantic cache: {e}")
+            return None
+        return response.data[0].embedding
+
+    async def aclose(self) -> None:
+        """Stop the batch collector and close the OpenAI connection pool"""
+        if self.batcher is not None:
+            await self.batcher.aclose()
+        await self.client.close()
+
+    async def _classify_one(self, message: str) -> Dict[str, Any]:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": self._system_prompt},
+                {"role": "user", "content": message},
+            ],
+            response_format=_INTENT_FORMAT,
+            max_tokens=CONFIG.INTENT_MAX_TOKENS,
+            temperature=CONFIG.INTENT_TEMPERATURE,
+        )
+        content = response.choices[0].message.content or ""
+        return IntentResult.model_validate_json(content).model_dump()
+
+    async def _classify_batch(self, messages: List[str]) -> List[Dict[str, Any]]:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": self._system_prompt + _BATCH_INSTRUCTIONS,
+                },
+                {"role": "user", "content": json.dumps(messages)},
+            ],
+            response_format=_BATCH_FORMAT,
+            max_tokens=CONFIG.INTENT_MAX_TOKENS * len(messages),
+            temperature=CONFIG.INTENT_TEMPERATURE,
+        )
+        content = response.choices[0].message.content or ""
+        results = IntentBatchResult.model_validate_json(content).classifications
+        if len(results) != len(messages):
+            raise ValueError(f"Expected {len(messages)} classifications from batch")
+        return [result.model_dump() for result in results]
 
     def _build_system_prompt(self) -> str:
         categories_text = "\n".join(
@@ -55,24 +353,8 @@ class IntentClassifier:
         )
 
         return f"""You are an intent classifier for a computer products customer support chatbot.
-
-Classify the customer message into ONE of these categories:
-{categories_text}
-
-Extract key entities like product names, order numbers, issues.
-
-Return ONLY valid JSON in this exact format:
-{{"intent": "CATEGORY", "confidence": 0.95, "entities": ["key", "terms"], "reasoning": "brief explanation"}}"""
+Classify the message into ONE category and extract key entities (product names, order numbers, issues) as JSON.
+{categories_text}"""
 
     def _get_category_description(self, category: str) -> str:
-        descriptions = {
-            "SEARCH_PRODUCTS": "Looking for products, browsing, specifications",
-            "ORDER_STATUS": "Checking order status, delivery, tracking",
-            "PLACE_ORDER": "Wanting to buy, purchase, order a product",
-            "WARRANTY_SUPPORT": "Warranty claims, returns, repairs",
-            "TECH_SUPPORT": "Technical issues, setup help, troubleshooting",
-            "GREETING": "Hello, hi, general greeting",
-            "ACCOUNT_INFO": "Account details, login issues, customer info",
-            "OTHER": "Anything that doesn't fit above categories",
-        }
-        return descriptions.get(category, "Unknown category")
+        return self._CATEGORY_DESCRIPTIONS.get(category, "Unknown category")
@@ -1,7 +1,9 @@
 """Langfuse integration for observability and tracing"""
 from typing import Any, Dict, Optional
 
-from config import Config
+from loguru import logger
+
+from config import CONFIG
 
 try:
     from langfuse import Langfuse
@@ -16,25 +18,27 @@ class LangfuseClient:
 
     def __init__(self):
         self.enabled = LANGFUSE_AVAILABLE and bool(
-            Config.LANGFUSE_PUBLIC_KEY and Config.LANGFUSE_SECRET_KEY
+            CONFIG.LANGFUSE_PUBLIC_KEY and CONFIG.LANGFUSE_SECRET_KEY
         )
         if self.enabled:
             try:
                 self.client = Langfuse(
-                    public_key=Config.LANGFUSE_PUBLIC_KEY,
-                    secret_key=Config.LANGFUSE_SECRET_KEY,
-                    host=Config.LANGFUSE_HOST,
+                    public_key=CONFIG.LANGFUSE_PUBLIC_KEY,
+                    secret_key=CONFIG.LANGFUSE_SECRET_KEY,
+                    host=CONFIG.LANGFUSE_HOST,
+                    flush_at=CONFIG.LANGFUSE_FLUSH_AT,
+                    flush_interval=CONFIG.LANGFUSE_FLUSH_INTERVAL,
                 )
             except Exception as e:
-                print(f"Failed to initialize Langfuse: {e}")
+                logger.warning(f"Failed to initialize Langfuse: {e}")
                 self.client = None
                 self.enabled = False
         else:
             self.client = None
             if not LANGFUSE_AVAILABLE:
-                print("Langfuse not available - observability disabled")
+                logger.info("Langfuse not available - observability disabled")
             else:
-                print("Langfuse not configured - observability disabled")
+                logger.info("Langfuse not configured - observability disabled")
 
     def create_trace(
         self,
@@ -71,7 +75,7 @@ class LangfuseClient:
             )
             return generation
         except Exception as e:
-            print(f"Langfuse generation logging failed: {e}")
+            logger.warning(f"Langfuse generation logging failed: {e}")
             return None
 
     def log_span(
@@ -97,13 +101,9 @@ class LangfuseClient:
         if not self.enabled or not trace_id:
             return None
 
-        try:
-            # For now, just print the event since Langfuse API is complex
-            print(f"Langfuse Event: {name} - {metadata}")
-            return None
-        except Exception as e:
-            print(f"Langfuse event logging failed: {e}")
-            return None
+        # For now, just log the event since Langfuse API is complex
+        logger.debug("Langfuse Event: {} - {}", name, metadata)
+        return None
 
     def update_trace(
         self,
@@ -115,13 +115,13 @@ class LangfuseClient:
         if not self.enabled or not trace_id:
             return
 
-        try:
-            # For now, just print the update since Langfuse API is complex
-            print(
-                f"Langfuse Trace Update: {trace_id} - Output: {output}, Metadata: {metadata}"
-            )
-        except Exception as e:
-            print(f"Langfuse trace update failed: {e}")
+        # For now, just log the update since Langfuse API is complex
+        logger.debug(
+            "Langfuse Trace Update: {} - Output: {}, Metadata: {}",
+            trace_id,
+            output,
+            metadata,
+        )
 
     def score_generation(
         self,
@@ -0,0 +1,77 @@
+"""Optional in-process intent classifier served with ONNX Runtime"""
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+from config import CONFIG, INTENT_CATEGORIES
+
+try:
+    import onnxruntime as ort
+    from tokenizers import Tokenizer
+
+    LOCAL_INTENT_AVAILABLE = True
+except ImportError:
+    LOCAL_INTENT_AVAILABLE = False
+
+
+class LocalIntentModel:
+    """Sequence classifier exported to ONNX, e.g. a fine-tuned DistilBERT
+
+    The model's output logits must follow the order of ``labels``, which
+    defaults to INTENT_CATEGORIES.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        tokenizer_path: str,
+        labels: Sequence[str] = INTENT_CATEGORIES,
+        max_length: int = 64,
+    ):
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length)
+        self.labels = tuple(labels)
+
+    def predict(self, message: str) -> Dict[str, Any]:
+        encoding = self.tokenizer.encode(message)
+        feeds = {
+            "input_ids": np.array([encoding.ids], dtype=np.int64),
+            "attention_mask": np.array([encoding.attention_mask], dtype=np.int64),
+            "token_type_ids": np.array([encoding.type_ids], dtype=np.int64),
+        }
+        logits = self.session.run(
+            None, {name: feeds[name] for name in self.input_names}
+        )[0][0]
+        probs = np.exp(logits - logits.max())
+        probs /= probs.sum()
+        best = int(probs.argmax())
+        # The model only labels the message; routing falls back to the raw
+        # message text when there are no entities
+        return {
+            "intent": self.labels[best],
+            "confidence": float(probs[best]),
+            "entities": [],
+        }
+
+
+def load_local_intent_model() -> Optional[LocalIntentModel]:
+    """Load the configured local model, or None to always use OpenAI"""
+    if not CONFIG.LOCAL_INTENT_MODEL:
+        return None
+    if not LOCAL_INTENT_AVAILABLE:
+        logger.warning("onnxruntime/tokenizers not installed - local intent disabled")
+        return None
+    try:
+        return LocalIntentModel(
+            CONFIG.LOCAL_INTENT_MODEL, CONFIG.LOCAL_INTENT_TOKENIZER
+        )
+    except Exception as e:
+        logger.warning(f"Failed to load local intent model: {e}")
+        return None
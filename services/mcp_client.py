@@ -1,48 +1,157 @@
+import hashlib
 import json
 import re
-from typing import Any, Dict, List, Optional, Tuple
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, Final, List, Mapping, Optional, Tuple
 
 import httpx
+import orjson
 from loguru import logger
 
-from config import CUSTOMERS, Config
+from config import CONFIG, CUSTOMERS, MCP_TOOLS
+from services.mcp_transport import build_mcp_transport
+from services.response_cache import TTLCache, cache_key
+
+_PARAM_TYPES = {"quantity": "integer"}
+_CUSTOMER_ID_RE = re.compile(r"ID: ([a-f0-9-]+)")
+# Intents that need a known customer; anyone else gets the product listing
+_CUSTOMER_INTENTS = frozenset({"ORDER_STATUS", "ACCOUNT_INFO", "PLACE_ORDER"})
+# Checked per entity in this order, so "laptop monitor arm" is a monitor
+_CATEGORY_PATTERNS = (
+    (re.compile(r"monitor", re.IGNORECASE), "Monitors"),
+    (re.compile(r"computer|laptop", re.IGNORECASE), "Computers"),
+)
+
+# Catalog lookups are customer-independent, so their results can be shared
+_CACHEABLE_TOOLS = frozenset({"search_products", "list_products", "get_product"})
+
+
+def _build_tools_schema() -> List[Dict[str, Any]]:
+    """Render MCP_TOOLS as an OpenAI function-calling schema"""
+    return [
+        {
+            "type": "function",
+            "function": {
+                "name": name,
+                "description": tool["description"],
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        param: {"type": _PARAM_TYPES.get(param, "string")}
+                        for param in tool["params"]
+                    },
+                    "required": list(tool["params"]),
+                },
+            },
+        }
+        for name, tool in MCP_TOOLS.items()
+    ]
+
+
+# MCP_TOOLS is fixed at deploy time, so the schema is serialized once here
+MCP_TOOLS_JSON: Final[bytes] = orjson.dumps(_build_tools_schema())
+MCP_TOOLS_ETAG: Final[
+    str
+] = f'"{hashlib.blake2b(MCP_TOOLS_JSON, digest_size=8).hexdigest()}"'
+
+
+def _extract_mcp_text(response: Dict[str, Any]) -> Optional[str]:
+    """Pull the text payload out of a JSON-RPC tools/call response"""
+    result = response.get("result")
+    if not result:
+        return None
+    structured = result.get("structuredContent")
+    if structured and "result" in structured:
+        return str(structured["result"])
+    content = result.get("content")
+    if content and "text" in content[0]:
+        return str(content[0]["text"])
+    return str(result)
+
+
+def _tools_call(
+    name: str, arguments: Dict[str, Any], request_id: int = 2
+) -> Dict[str, Any]:
+    """Build a JSON-RPC tools/call request"""
+    return {
+        "jsonrpc": "2.0",
+        "method": "tools/call",
+        "params": {"name": name, "arguments": arguments},
+        "id": request_id,
+    }
+
+
+# Customer credentials are static, so each verification request body is
+# serialized once at import instead of on every order or account lookup
+_VERIFY_PAYLOADS: Final[Mapping[str, bytes]] = MappingProxyType(
+    {
+        email: orjson.dumps(
+            _tools_call("verify_customer_pin", {"email": email, "pin": pin})
+        )
+        for email, pin in CUSTOMERS.items()
+    }
+)
 
 
 class MCPClient:
     def __init__(self):
-        self.server_url = Config.MCP_SERVER_URL
-        self.timeout = httpx.Timeout(Config.MCP_TIMEOUT)
+        self.server_url = CONFIG.MCP_SERVER_URL
+        self.timeout = httpx.Timeout(CONFIG.MCP_TIMEOUT)
         self.headers = {
             "Content-Type": "application/json",
             "Accept": "application/json",
         }
-        self.limits = httpx.Limits(max_keepalive_connections=5, max_connections=10)
+        self.limits = httpx.Limits(
+            max_connections=CONFIG.MCP_MAX_CONNECTIONS,
+            max_keepalive_connections=CONFIG.MCP_MAX_KEEPALIVE,
+            keepalive_expiry=CONFIG.MCP_KEEPALIVE_EXPIRY,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self.cache = TTLCache(CONFIG.RESPONSE_CACHE_SIZE, CONFIG.RESPONSE_CACHE_TTL)
+        # Customer IDs never change, so order lookups can skip re-verifying
+        self.customer_ids = TTLCache(len(CUSTOMERS), CONFIG.RESPONSE_CACHE_TTL)
+        # Account details can change, so the verify text is kept only briefly
+        self.customer_info = TTLCache(len(CUSTOMERS), CONFIG.CUSTOMER_INFO_TTL)
+        self._routes: Dict[str, Callable[..., Awaitable[Tuple[Optional[Dict], str]]]]
+        self._routes = {
+            "SEARCH_PRODUCTS": self._handle_search_products,
+            "ORDER_STATUS": self._handle_order_status,
+            "ACCOUNT_INFO": self._handle_account_info,
+            "PLACE_ORDER": self._handle_place_order,
+            "WARRANTY_SUPPORT": self._handle_warranty_support,
+        }
+
+    def get_client(self) -> httpx.AsyncClient:
+        """Return the pooled HTTP client, creating it on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                headers=self.headers,
+                http2=CONFIG.MCP_HTTP2,
+                transport=build_mcp_transport(self.limits),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP client and its keep-alive connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     async def route_intent_to_mcp(
         self, intent: str, entities: List[str], message: str, customer: str
     ) -> Tuple[Optional[Dict[str, Any]], str]:
-        async with httpx.AsyncClient(
-            timeout=self.timeout, limits=self.limits, headers=self.headers
-        ) as client:
-            if intent == "SEARCH_PRODUCTS":
-                return await self._handle_search_products(entities, message), ""
-
-            elif intent == "ORDER_STATUS" and customer in CUSTOMERS:
-                return await self._handle_order_status(client, customer)
-
-            elif intent == "ACCOUNT_INFO" and customer in CUSTOMERS:
-                return await self._handle_account_info(client, customer)
-
-            elif intent == "PLACE_ORDER" and customer in CUSTOMERS:
-                return await self._handle_place_order(entities, message), ""
-
-            elif intent == "WARRANTY_SUPPORT":
-                return await self._handle_warranty_support(), ""
-
-            else:
-                return await self._handle_default_products(entities), ""
-
-    async def _handle_search_products(self, entities: List[str], message: str) -> Dict:
+        handler = self._routes.get(intent)
+        if handler is None or (
+            intent in _CUSTOMER_INTENTS and customer not in CUSTOMERS
+        ):
+            return await self._handle_default_products(entities), ""
+        return await handler(entities, message, customer)
+
+    async def _handle_search_products(
+        self, entities: List[str], message: str, customer: str
+    ) -> Tuple[Optional[Dict], str]:
         """Handle product search requests"""
         search_term = (
             " ".join(entities)
@@ -52,190 +161,157 @@ class MCPClient:
         if not search_term:
             search_term = "monitor"
 
-        return {
-            "jsonrpc": "2.0",
-            "method": "tools/call",
-            "params": {"name": "search_products", "arguments": {"query": search_term}},
-            "id": 2,
-        }
+        return _tools_call("search_products", {"query": search_term}), ""
+
+    async def _verify_customer(self, customer: str) -> Tuple[Optional[str], int]:
+        """Return the customer's verified details and the verify status code"""
+        customer_info = self.customer_info.get(customer)
+        if customer_info is not None:
+            return customer_info, 200
+
+        verify_resp = await self.get_client().post(
+            self.server_url, content=_VERIFY_PAYLOADS[customer], timeout=10.0
+        )
+        logger.debug("Customer verify response: {}", verify_resp.status_code)
+        if verify_resp.status_code != 200:
+            return None, verify_resp.status_code
+
+        verify_result = orjson.loads(verify_resp.content)
+        logger.debug("Verify result structure: {}", verify_result)
+        customer_info = self._extract_customer_info(verify_result)
+        if customer_info:
+            self.customer_info.set(customer, customer_info)
+        return customer_info, verify_resp.status_code
 
     async def _handle_order_status(
-        self, client: httpx.AsyncClient, customer: str
+        self, entities: List[str], message: str, customer: str
     ) -> Tuple[Optional[Dict], str]:
-        verify_msg = {
-            "jsonrpc": "2.0",
-            "method": "tools/call",
-            "params": {
-                "name": "verify_customer_pin",
-                "arguments": {"email": customer, "pin": CUSTOMERS[customer]},
-            },
-            "id": 2,
-        }
+        customer_id = self.customer_ids.get(customer)
+        if customer_id is not None:
+            return self._list_orders_msg(customer_id), ""
 
         try:
-            verify_resp = await client.post(
-                self.server_url, json=verify_msg, headers=self.headers, timeout=10.0
-            )
-            logger.debug(f"Customer verify response: {verify_resp.status_code}")
-
-            if verify_resp.status_code == 200:
-                verify_result = verify_resp.json()
-                logger.debug(f"Verify result structure: {verify_result}")
-
-                customer_info = self._extract_customer_info(verify_result)
-                if customer_info:
-                    customer_id = self._extract_customer_id(customer_info)
-                    if customer_id:
-                        logger.debug(f"Found customer ID: {customer_id}")
-                        order_msg = {
-                            "jsonrpc": "2.0",
-                            "method": "tools/call",
-                            "params": {
-                                "name": "list_orders",
-                                "arguments": {"customer_id": customer_id},
-                            },
-                            "id": 3,
-                        }
-                        return order_msg, ""
-                    else:
-                        return None, f"Customer verified: {customer_info[:200]}..."
-                else:
-                    return (
-                        None,
-                        "Unable to verify customer information. Please check your credentials.",
-                    )
-            else:
-                return (
-                    None,
-                    f"Customer verification failed (status {verify_resp.status_code}). Please check your email and PIN.",
-                )
-
+            customer_info, status = await self._verify_customer(customer)
         except Exception as verify_error:
-            logger.error(f"Customer verification error: {verify_error}")
+            logger.error("Customer verification error: {}", verify_error)
             return (
                 None,
                 "Unable to verify customer at this time. Please try again later.",
             )
 
+        if status != 200:
+            return (
+                None,
+                f"Customer verification failed (status {status}). Please check your email and PIN.",
+            )
+        if not customer_info:
+            return (
+                None,
+                "Unable to verify customer information. Please check your credentials.",
+            )
+
+        customer_id = self._extract_customer_id(customer_info)
+        if not customer_id:
+            return None, f"Customer verified: {customer_info[:200]}..."
+        logger.debug("Found customer ID: {}", customer_id)
+        self.customer_ids.set(customer, customer_id)
+        return self._list_orders_msg(customer_id), ""
+
+    def _list_orders_msg(self, customer_id: str) -> Dict:
+        return _tools_call("list_orders", {"customer_id": customer_id}, request_id=3)
+
     async def _handle_account_info(
-        self, client: httpx.AsyncClient, customer: str
+        self, entities: List[str], message: str, customer: str
     ) -> Tuple[Optional[Dict], str]:
-        verify_msg = {
-            "jsonrpc": "2.0",
-            "method": "tools/call",
-            "params": {
-                "name": "verify_customer_pin",
-                "arguments": {"email": customer, "pin": CUSTOMERS[customer]},
-            },
-            "id": 2,
-        }
-
         try:
-            verify_resp = await client.post(
-                self.server_url, json=verify_msg, headers=self.headers, timeout=10.0
-            )
-            logger.debug(f"Account info response: {verify_resp.status_code}")
-
-            if verify_resp.status_code == 200:
-                verify_result = verify_resp.json()
-                logger.debug(f"Account info result: {verify_result}")
-
-                customer_info = self._extract_customer_info(verify_result)
-                if customer_info:
-                    return None, f"Your account information:\n{customer_info}"
-                else:
-                    return (
-                        None,
-                        "Unable to retrieve account information. Please contact support.",
-                    )
-            else:
-                return (
-                    None,
-                    "Unable to access account information. Please check your credentials.",
-                )
-
+            customer_info, status = await self._verify_customer(customer)
         except Exception as account_error:
-            print(f"Account info error: {account_error}")
+            logger.error("Account info error: {}", account_error)
             return None, "Unable to retrieve account information at this time."
 
-    async def _handle_place_order(self, entities: List[str], message: str) -> Dict:
+        if status != 200:
+            return (
+                None,
+                "Unable to access account information. Please check your credentials.",
+            )
+        if not customer_info:
+            return (
+                None,
+                "Unable to retrieve account information. Please contact support.",
+            )
+        return None, f"Your account information:\n{customer_info}"
+
+    async def _handle_place_order(
+        self, entities: List[str], message: str, customer: str
+    ) -> Tuple[Optional[Dict], str]:
         """Handle order placement requests"""
         if entities:
             search_term = " ".join(entities)
-            return {
-                "jsonrpc": "2.0",
-                "method": "tools/call",
-                "params": {
-                    "name": "search_products",
-                    "arguments": {"query": search_term},
-                },
-                "id": 2,
-            }
+            return _tools_call("search_products", {"query": search_term}), ""
         else:
-            return {
-                "jsonrpc": "2.0",
-                "method": "tools/call",
-                "params": {
-                    "name": "list_products",
-                    "arguments": {"category": "Monitors"},
-                },
-                "id": 2,
-            }
+            return _tools_call("list_products", {"category": "Monitors"}), ""
 
-    async def _handle_warranty_support(self) -> Dict:
+    async def _handle_warranty_support(
+        self, entities: List[str], message: str, customer: str
+    ) -> Tuple[Optional[Dict], str]:
         """Handle warranty support requests"""
-        return {
-            "jsonrpc": "2.0",
-            "method": "tools/call",
-            "params": {"name": "list_products", "arguments": {"category": None}},
-            "id": 2,
-        }
+        return _tools_call("list_products", {"category": None}), ""
 
     async def _handle_default_products(self, entities: List[str]) -> Dict:
         """Handle default product listing with smart category detection"""
-        category = None
-        for entity in entities:
-            if "monitor" in entity.lower():
-                category = "Monitors"
-                break
-            elif "computer" in entity.lower() or "laptop" in entity.lower():
-                category = "Computers"
-                break
-
-        return {
-            "jsonrpc": "2.0",
-            "method": "tools/call",
-            "params": {"name": "list_products", "arguments": {"category": category}},
-            "id": 2,
-        }
+        category = next(
+            (
+                name
+                for entity in entities
+                for pattern, name in _CATEGORY_PATTERNS
+                if pattern.search(entity)
+            ),
+            None,
+        )
+
+        return _tools_call("list_products", {"category": category})
 
     async def execute_mcp_call(self, tool_msg: Dict) -> Dict:
         """Execute MCP tool call and return processed response"""
+        params = tool_msg.get("params") or {}
+        key = None
+        if params.get("name") in _CACHEABLE_TOOLS:
+            key = cache_key(orjson.dumps(params, option=orjson.OPT_SORT_KEYS).decode())
+            cached = self.cache.get(key)
+            if cached is not None:
+                return dict(cached)
+
+        result = await self._send_mcp_call(tool_msg)
+        if key is not None and "content" in result:
+            self.cache.set(key, result)
+        return result
+
+    async def _send_mcp_call(self, tool_msg: Dict) -> Dict:
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                print(f"Sending MCP request: {tool_msg}")
-                tool_resp = await client.post(
-                    self.server_url, json=tool_msg, headers=self.headers
-                )
-                print(f"MCP response status: {tool_resp.status_code}")
-
-                if tool_resp.status_code == 200:
-                    return await self._process_success_response(tool_resp)
-                else:
-                    return self._process_error_response(tool_resp)
+            client = self.get_client()
+            logger.debug("Sending MCP request: {}", tool_msg.get("params"))
+            tool_resp = await client.post(
+                self.server_url, content=orjson.dumps(tool_msg)
+            )
+            logger.debug("MCP response status: {}", tool_resp.status_code)
+
+            if tool_resp.status_code == 200:
+                return await self._process_success_response(tool_resp)
+            else:
+                return self._process_error_response(tool_resp)
 
         except httpx.TimeoutException:
-            print("MCP request timeout")
+            logger.warning("MCP request timeout")
             return {
                 "error": "Request timed out. Please try again with a shorter query."
             }
         except httpx.ConnectError:
-            print("MCP connection failed")
+            logger.error("MCP connection failed")
             return {
                 "error": "Unable to connect to product database. Please check your connection and try again."
             }
-        except Exception as e:
-            print(f"Unexpected MCP error: {e}")
+        except Exception:
+            logger.exception("Unexpected MCP error")
             return {
                 "error": "An unexpected error occurred. Please try again or contact support if this continues."
             }
@@ -243,55 +319,39 @@ class MCPClient:
     async def _process_success_response(self, response: httpx.Response) -> Dict:
         """Process successful MCP response"""
         try:
-            result = response.json()
-            print(f"MCP result: {result}")
-
-            if "result" in result and result["result"]:
-                if (
-                    "structuredContent" in result["result"]
-                    and result["result"]["structuredContent"]
-                    and "result" in result["result"]["structuredContent"]
-                ):
-                    content = result["result"]["structuredContent"]["result"]
-                    print(f"Updated response to: {content[:100]}...")
-                elif (
-                    "content" in result["result"]
-                    and result["result"]["content"]
-                    and len(result["result"]["content"]) > 0
-                    and "text" in result["result"]["content"][0]
-                ):
-                    content = result["result"]["content"][0]["text"]
-                    print(f"Updated response to: {content[:100]}...")
-                else:
-                    content = str(result["result"])
-                    print(f"Fallback response: {content[:100]}...")
+            result = orjson.loads(response.content)
 
+            content = _extract_mcp_text(result)
+            if content is not None:
+                logger.debug("Updated response to: {:.100}...", content)
                 return {"content": content}
 
-            elif "error" in result:
+            if "error" in result:
                 error_msg = result["error"].get("message", "Unknown MCP error")
-                print(f"MCP returned error: {error_msg}")
+                logger.warning("MCP returned error: {}", error_msg)
                 return {
                     "error": f"Service temporarily unavailable: {error_msg}. Please try again later."
                 }
             else:
-                print(f"Unexpected MCP response structure: {result}")
+                logger.warning("Unexpected MCP response structure: {}", result)
                 return {
                     "error": "Unable to process your request at this time. Please try again."
                 }
 
         except json.JSONDecodeError as json_err:
-            print(f"Invalid JSON response from MCP: {json_err}")
+            logger.error("Invalid JSON response from MCP: {}", json_err)
             return {"error": "Service temporarily unavailable. Please try again later."}
         except Exception as parse_err:
-            print(f"Error parsing MCP response: {parse_err}")
+            logger.error("Error parsing MCP response: {}", parse_err)
             return {
                 "error": "Unable to process your request at this time. Please try again."
             }
 
     def _process_error_response(self, response: httpx.Response) -> Dict:
         """Process MCP error response"""
-        print(f"MCP error response: {response.status_code} - {response.text}")
+        logger.warning("MCP error response: {}", response.status_code)
+        # Error bodies can be large; decode them only when debugging
+        logger.opt(lazy=True).debug("MCP error body: {}", lambda: response.text)
 
         if response.status_code == 404:
             return {
@@ -310,19 +370,9 @@ class MCPClient:
 
     def _extract_customer_info(self, verify_result: Dict) -> Optional[str]:
         """Extract customer information from verification result"""
-        if "result" not in verify_result:
-            return None
-
-        result = verify_result["result"]
-
-        if "structuredContent" in result and "result" in result["structuredContent"]:
-            return str(result["structuredContent"]["result"])
-        elif "content" in result and result["content"]:
-            return str(result["content"][0]["text"])
-        else:
-            return str(result)
+        return _extract_mcp_text(verify_result)
 
     def _extract_customer_id(self, customer_info: str) -> Optional[str]:
         """Extract customer ID from customer info text"""
-        customer_id_match = re.search(r"ID: ([a-f0-9-]+)", customer_info)
+        customer_id_match = _CUSTOMER_ID_RE.search(customer_info)
         return customer_id_match.group(1) if customer_id_match else None
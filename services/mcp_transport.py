@@ -0,0 +1,83 @@
+"""Optional aiohttp connection pool behind the MCP httpx client"""
+import asyncio
+from typing import Optional
+
+import httpx
+from loguru import logger
+
+from config import CONFIG
+
+try:
+    import aiohttp
+
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+
+class AiohttpTransport(httpx.AsyncBaseTransport):
+    """Send httpx requests over a shared aiohttp session
+
+    httpx still builds requests and decodes responses, so MCPClient's
+    request and response handling is unchanged; only connection pooling and
+    socket I/O move to aiohttp. This transport speaks HTTP/1.1 only.
+    """
+
+    def __init__(self, limits: httpx.Limits):
+        self.limits = limits
+        self._session: Optional["aiohttp.ClientSession"] = None
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limits.max_connections or 0,
+                keepalive_timeout=self.limits.keepalive_expiry or 15.0,
+            )
+            # httpx decodes the body from the response headers, so aiohttp
+            # must hand it over untouched
+            self._session = aiohttp.ClientSession(
+                connector=connector, auto_decompress=False
+            )
+        return self._session
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        timeout = request.extensions.get("timeout", {})
+        try:
+            async with self._get_session().request(
+                request.method,
+                str(request.url),
+                headers=list(request.headers.multi_items()),
+                data=await request.aread(),
+                allow_redirects=False,
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=timeout.get("connect"),
+                    sock_read=timeout.get("read"),
+                ),
+            ) as response:
+                content = await response.read()
+        except asyncio.TimeoutError as e:
+            raise httpx.ReadTimeout(str(e), request=request) from e
+        except aiohttp.ClientConnectionError as e:
+            raise httpx.ConnectError(str(e), request=request) from e
+
+        return httpx.Response(
+            response.status,
+            headers=response.raw_headers,
+            content=content,
+            request=request,
+        )
+
+    async def aclose(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+def build_mcp_transport(limits: httpx.Limits) -> Optional[httpx.AsyncBaseTransport]:
+    """Return the configured transport, or None for httpx's own pool"""
+    if CONFIG.MCP_TRANSPORT != "aiohttp":
+        return None
+    if not AIOHTTP_AVAILABLE:
+        logger.warning("aiohttp not installed - MCP calls use the httpx transport")
+        return None
+    return AiohttpTransport(limits)
@@ -0,0 +1,108 @@
+"""In-process caches for LLM and MCP results"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def cache_key(*parts: str) -> str:
+    """Hash the key parts so raw customer messages are never stored as keys"""
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after ``ttl`` seconds"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SemanticCache:
+    """Bounded ring of embeddings matched by cosine similarity"""
+
+    def __init__(self, maxsize: int, threshold: float):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._values: List[Any] = []
+        self._next = 0
+
+    def get(self, embedding: Sequence[float]) -> Optional[Any]:
+        if not self._values:
+            self.misses += 1
+            return None
+        assert self._vectors is not None
+        sims = self._vectors[: len(self._values)] @ _unit(embedding)
+        best = int(sims.argmax())
+        if sims[best] < self.threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._values[best]
+
+    def set(self, embedding: Sequence[float], value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        vector = _unit(embedding)
+        if self._vectors is None:
+            self._vectors = np.zeros((self.maxsize, vector.size), dtype=np.float32)
+        # Overwrite the oldest entry once the ring is full
+        self._vectors[self._next] = vector
+        if len(self._values) < self.maxsize:
+            self._values.append(value)
+        else:
+            self._values[self._next] = value
+        self._next = (self._next + 1) % self.maxsize
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._values)}
+
+    def clear(self) -> None:
+        self._vectors = None
+        self._values.clear()
+        self._next = 0
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+def _unit(embedding: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -1,25 +1,45 @@
 import asyncio
+import io
+import re
+from itertools import islice
 from typing import Any, AsyncGenerator, Dict
 
 from fastapi import Request
 from loguru import logger
 
-from config import Config
+from config import CONFIG
+
+_FULL_CATALOG = "Found 200 products:"
+_WORD_RE = re.compile(r"[a-z]+")
+_GREETING_WORDS = frozenset({"hello", "hi", "hey"})
+_THANKS_WORDS = frozenset({"thank", "thanks"})
+_GOODBYE_WORDS = frozenset({"bye", "goodbye"})
 
 
 class StreamingService:
     def __init__(self):
-        self.char_threshold = Config.CHAR_STREAMING_THRESHOLD
-        self.word_threshold = Config.WORD_STREAMING_THRESHOLD
-        self.char_delay = Config.CHAR_STREAM_DELAY
-        self.word_delay = Config.WORD_STREAM_DELAY
-        self.line_delay = Config.LINE_STREAM_DELAY
-        self.max_display = Config.MAX_PRODUCTS_DISPLAY
-        self.truncation_enabled = Config.PRODUCT_TRUNCATION_ENABLED
+        self.char_threshold = CONFIG.CHAR_STREAMING_THRESHOLD
+        self.word_threshold = CONFIG.WORD_STREAMING_THRESHOLD
+        self.char_delay = CONFIG.CHAR_STREAM_DELAY
+        self.word_delay = CONFIG.WORD_STREAM_DELAY
+        self.line_delay = CONFIG.LINE_STREAM_DELAY
+        self.chunk_size = CONFIG.STREAM_CHUNK_SIZE
+        self.burst = max(CONFIG.STREAM_BURST, 1)
+        self.max_display = CONFIG.MAX_PRODUCTS_DISPLAY
+        self.truncation_enabled = CONFIG.PRODUCT_TRUNCATION_ENABLED
 
     async def stream_response(
-        self, response: str, request: Request, intent: str | None = None
+        self,
+        response: str,
+        request: Request | None = None,
+        intent: str | None = None,
     ) -> AsyncGenerator[Dict[str, Any], None]:
+        # The client may be gone by the time the reply is ready; skip the
+        # truncation and strategy work entirely
+        if request is not None and await request.is_disconnected():
+            yield {"data": "[DONE]"}
+            return
+
         response = self._handle_product_truncation(response)
 
         if intent == "PLACE_ORDER":
@@ -28,77 +48,93 @@ class StreamingService:
         logger.debug(f"Streaming response length: {len(response)} chars")
 
         if len(response) <= self.char_threshold:
-            async for chunk in self._stream_by_character(response, request):
-                yield chunk
+            stream, delay = self._stream_by_character, self.char_delay
         elif len(response) <= self.word_threshold:
-            async for chunk in self._stream_by_word(response, request):
-                yield chunk
+            stream, delay = self._stream_by_word, self.word_delay
         else:
-            async for chunk in self._stream_by_line(response, request):
-                yield chunk
+            stream, delay = self._stream_by_line, self.line_delay
+
+        # Without pacing there is nothing to gain from tiny frames
+        if not delay:
+            stream = self._stream_in_chunks
+
+        async for chunk in stream(response, request):
+            yield chunk
 
         logger.debug("Sending DONE signal")
         yield {"data": "[DONE]"}
 
+    async def _stream_in_chunks(
+        self, response: str, request: Request | None
+    ) -> AsyncGenerator[Dict[str, str], None]:
+        for i in range(0, len(response), self.chunk_size):
+            if request is not None and await request.is_disconnected():
+                break
+            yield {"data": response[i : i + self.chunk_size]}
+
     async def _stream_by_character(
-        self, response: str, request: Request
+        self, response: str, request: Request | None
     ) -> AsyncGenerator[Dict[str, str], None]:
-        for char in response:
-            if await request.is_disconnected():
+        for i in range(0, len(response), self.burst):
+            if request is not None and await request.is_disconnected():
                 break
-            yield {"data": char}
-            await asyncio.sleep(self.char_delay)
+            chars = response[i : i + self.burst]
+            yield {"data": chars}
+            await asyncio.sleep(self.char_delay * len(chars))
 
     async def _stream_by_word(
-        self, response: str, request: Request
+        self, response: str, request: Request | None
     ) -> AsyncGenerator[Dict[str, str], None]:
         words = response.split(" ")
-        for word in words:
-            if await request.is_disconnected():
+        for i in range(0, len(words), self.burst):
+            if request is not None and await request.is_disconnected():
                 break
-            yield {"data": word + " "}
-            await asyncio.sleep(self.word_delay)
+            group = words[i : i + self.burst]
+            yield {"data": " ".join(group) + " "}
+            await asyncio.sleep(self.word_delay * len(group))
 
     async def _stream_by_line(
-        self, response: str, request: Request
+        self, response: str, request: Request | None
     ) -> AsyncGenerator[Dict[str, str], None]:
         lines = response.split("\n")
         for line in lines:
-            if await request.is_disconnected():
+            if request is not None and await request.is_disconnected():
                 break
             yield {"data": line + "\n"}
             await asyncio.sleep(self.line_delay)
 
     def _handle_product_truncation(self, response: str) -> str:
-        if not self.truncation_enabled:
+        if not self.truncation_enabled or not response.startswith(_FULL_CATALOG):
             return response
 
-        if "Found 200 products:" in response:
-            lines = response.split("\n")
-            summary = lines[0]
-            products = [line for line in lines[1:] if line.strip() and "[" in line][
-                : self.max_display
-            ]
-
-            truncated_response = (
-                summary + "\n\n" + "\n\n".join(products[: self.max_display])
+        # Read lines lazily and stop one past the display limit instead of
+        # splitting the whole catalog dump
+        lines = io.StringIO(response)
+        summary = next(lines).rstrip("\n")
+        products = list(
+            islice(
+                (line.rstrip("\n") for line in lines if "[" in line),
+                self.max_display + 1,
             )
-            if len(products) > self.max_display:
-                remaining = 200 - self.max_display
-                truncated_response += f"\n\n... and {remaining} more products.\nType 'search [keyword]' to find specific items or 'list monitors' for category browsing."
+        )
 
-            logger.debug(f"Truncated to {len(truncated_response)} chars for better UX")
-            return truncated_response
+        truncated_response = (
+            summary + "\n\n" + "\n\n".join(products[: self.max_display])
+        )
+        if len(products) > self.max_display:
+            remaining = 200 - self.max_display
+            truncated_response += f"\n\n... and {remaining} more products.\nType 'search [keyword]' to find specific items or 'list monitors' for category browsing."
 
-        return response
+        logger.debug(f"Truncated to {len(truncated_response)} chars for better UX")
+        return truncated_response
 
 
 def get_simple_response(msg: str, customer: str) -> str:
-    msg_lower = msg.lower()
-    if any(word in msg_lower for word in ["hello", "hi", "hey"]):
+    words = set(_WORD_RE.findall(msg.lower()))
+    if not words.isdisjoint(_GREETING_WORDS):
         return f"Hello {customer}! How can I help with your computer products today?"
-    if any(word in msg_lower for word in ["thank", "thanks"]):
+    if not words.isdisjoint(_THANKS_WORDS):
         return "You're welcome! Is there anything else I can help you with?"
-    if any(word in msg_lower for word in ["bye", "goodbye"]):
+    if not words.isdisjoint(_GOODBYE_WORDS):
         return "Goodbye! Have a great day, and feel free to reach out if you need any help."
     return "I can help with orders, products, warranties, and technical issues. What do you need?"
@@ -0,0 +1,24 @@
+"""Shared test fixtures"""
+import pytest
+from fastapi.testclient import TestClient
+from pytest_asyncio import is_async_test
+
+from main import app
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Create one test client for the whole session
+
+    Not entered as a context manager: the lifespan would run
+    CONFIG.validate(), which needs real API credentials.
+    """
+    return TestClient(app)
+
+
+def pytest_collection_modifyitems(items):
+    """Run every async test on one session-wide event loop"""
+    session_loop = pytest.mark.asyncio(loop_scope="session")
+    for item in items:
+        if is_async_test(item):
+            item.add_marker(session_loop, append=False)
@@ -0,0 +1,76 @@
+"""Tests for customer PIN verification"""
+from config import CUSTOMERS
+from services.auth import PIN_DIGESTS, LoginThrottle, verify_pin
+
+_ACCOUNTS = ("a@example.com", "b@example.com")
+
+
+class TestVerifyPin:
+    """Test constant-time PIN verification"""
+
+    def test_valid_pin(self):
+        """Test every known customer verifies with their PIN"""
+        for email, pin in CUSTOMERS.items():
+            assert verify_pin(email, pin) is True
+
+    def test_wrong_pin(self):
+        """Test a wrong PIN is rejected"""
+        assert verify_pin("donaldgarcia@example.net", "0000") is False
+
+    def test_unknown_customer(self):
+        """Test an unknown email is rejected"""
+        assert verify_pin("nobody@example.com", "7912") is False
+
+    def test_non_string_input(self):
+        """Test missing or non-string credentials are rejected"""
+        assert verify_pin(None, "7912") is False
+        assert verify_pin("donaldgarcia@example.net", 7912) is False
+
+    def test_digests_do_not_store_plaintext(self):
+        """Test the digest table never holds the raw PIN"""
+        for email, pin in CUSTOMERS.items():
+            assert PIN_DIGESTS[email] != pin.encode()
+            assert len(PIN_DIGESTS[email]) == 32
+
+
+class TestLoginThrottle:
+    """Test failed-attempt lockout"""
+
+    def test_locks_after_max_failures(self):
+        """Test an email locks once it reaches the failure limit"""
+        throttle = LoginThrottle(max_failures=2, lockout=60, accounts=_ACCOUNTS)
+        throttle.record("a@example.com", False)
+        assert throttle.is_locked("a@example.com") is False
+        throttle.record("a@example.com", False)
+        assert throttle.is_locked("a@example.com") is True
+        assert throttle.is_locked("b@example.com") is False
+
+    def test_success_resets_failures(self):
+        """Test a successful login clears the failure count"""
+        throttle = LoginThrottle(max_failures=2, lockout=60, accounts=_ACCOUNTS)
+        throttle.record("a@example.com", False)
+        throttle.record("a@example.com", True)
+        throttle.record("a@example.com", False)
+        assert throttle.is_locked("a@example.com") is False
+
+    def test_lockout_expires(self):
+        """Test the lockout lifts after the window passes"""
+        throttle = LoginThrottle(max_failures=1, lockout=0, accounts=_ACCOUNTS)
+        throttle.record("a@example.com", False)
+        assert throttle.is_locked("a@example.com") is False
+
+    def test_disabled(self):
+        """Test a non-positive limit never locks"""
+        throttle = LoginThrottle(max_failures=0, lockout=60, accounts=_ACCOUNTS)
+        throttle.record("a@example.com", False)
+        assert throttle.is_locked("a@example.com") is False
+
+    def test_unknown_emails_do_not_evict(self):
+        """Test failures for other emails cannot unlock a locked account"""
+        throttle = LoginThrottle(max_failures=1, lockout=60, accounts=_ACCOUNTS)
+        throttle.record("a@example.com", False)
+        for i in range(100):
+            throttle.record(f"spray{i}@example.com", False)
+
+        assert throttle.is_locked("a@example.com") is True
+        assert throttle.is_locked("spray0@example.com") is False
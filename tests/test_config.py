@@ -1,10 +1,22 @@
 """Tests for configuration module"""
+import dataclasses
 import os
+import sys
+from types import SimpleNamespace
 from unittest.mock import patch
 
 import pytest
 
-from config import Config
+import config
+from config import CONFIG, Config
+from scripts.compile_env import compile_env
+
+
+@pytest.fixture
+def isolated_settings(monkeypatch):
+    """Restore CONFIG and the exported setting globals after the test"""
+    for name in ("CONFIG", "_PARSED", *config._SETTING_NAMES):
+        monkeypatch.setitem(vars(config), name, getattr(config, name))
 
 
 class TestConfig:
@@ -12,40 +24,179 @@ class TestConfig:
 
     def test_config_defaults(self):
         """Test default configuration values"""
-        assert Config.APP_HOST == "0.0.0.0"
-        assert Config.APP_PORT == 8000
-        assert Config.INTENT_CONFIDENCE_THRESHOLD == 0.7
-        assert Config.CHAR_STREAMING_THRESHOLD == 200
-        assert Config.WORD_STREAMING_THRESHOLD == 1000
-        assert Config.MAX_PRODUCTS_DISPLAY == 8
-        assert Config.PRODUCT_TRUNCATION_ENABLED is True
+        assert CONFIG.APP_HOST == "0.0.0.0"
+        assert CONFIG.APP_PORT == 8000
+        assert CONFIG.INTENT_CONFIDENCE_THRESHOLD == 0.7
+        assert CONFIG.CHAR_STREAMING_THRESHOLD == 200
+        assert CONFIG.WORD_STREAMING_THRESHOLD == 1000
+        assert CONFIG.MAX_PRODUCTS_DISPLAY == 8
+        assert CONFIG.PRODUCT_TRUNCATION_ENABLED is True
 
     def test_config_validation_missing_api_key(self):
         """Test validation fails when API key is missing"""
-        with patch.object(Config, "OPENAI_API_KEY", ""):
-            with pytest.raises(
-                ValueError, match="Missing required environment variables"
-            ):
-                Config.validate()
+        config = dataclasses.replace(CONFIG, OPENAI_API_KEY="")
+        with pytest.raises(ValueError, match="Missing required environment variables"):
+            config.validate()
 
     def test_config_validation_missing_mcp_url(self):
         """Test validation fails when MCP URL is missing"""
-        with patch.object(Config, "MCP_SERVER_URL", ""):
-            with pytest.raises(
-                ValueError, match="Missing required environment variables"
-            ):
-                Config.validate()
+        config = dataclasses.replace(CONFIG, MCP_SERVER_URL="")
+        with pytest.raises(ValueError, match="Missing required environment variables"):
+            config.validate()
 
     def test_config_validation_success(self):
         """Test validation passes when all required vars are present"""
-        with patch.object(Config, "OPENAI_API_KEY", "test-key"):
-            with patch.object(Config, "MCP_SERVER_URL", "https://example.com"):
-                assert Config.validate() is True
+        config = dataclasses.replace(
+            CONFIG, OPENAI_API_KEY="test-key", MCP_SERVER_URL="https://example.com"
+        )
+        assert config.validate() is True
 
     @patch.dict(os.environ, {"INTENT_CONFIDENCE_THRESHOLD": "0.8"})
     def test_config_env_override(self):
         """Test environment variables override defaults"""
-        from config import Config
+        assert Config.from_env().INTENT_CONFIDENCE_THRESHOLD == 0.8
+
+    @pytest.mark.parametrize(
+        "raw, expected",
+        [("true", True), ("YES", True), ("1", True), ("false", False), ("0", False)],
+    )
+    def test_config_bool_parsing(self, monkeypatch, raw, expected):
+        """Test boolean settings accept common truthy spellings"""
+        monkeypatch.setenv("PRODUCT_TRUNCATION_ENABLED", raw)
+        assert Config.from_env().PRODUCT_TRUNCATION_ENABLED is expected
+
+    def test_config_built_lazily(self, monkeypatch, isolated_settings):
+        """Test CONFIG is parsed on first access and then memoized"""
+        monkeypatch.delitem(vars(config), "CONFIG")
+        monkeypatch.delitem(vars(config), "_PARSED")
+
+        first = config.CONFIG
+        assert vars(config)["CONFIG"] is first
+        assert config.CONFIG is first
+        assert first.APP_PORT == CONFIG.APP_PORT
+
+    def test_settings_as_module_attributes(self):
+        """Test individual settings resolve as read-only module attributes"""
+        assert config.INTENT_TEMPERATURE == CONFIG.INTENT_TEMPERATURE
+        assert config.APP_TITLE == CONFIG.APP_TITLE
+        with pytest.raises(TypeError):
+            config._PARSED["APP_PORT"] = 9000  # type: ignore[index]
+        with pytest.raises(AttributeError):
+            config.NOT_A_SETTING
+
+    def test_settings_exported_as_globals(self):
+        """Test loaded settings are plain module globals listed in __all__"""
+        from config import MAX_PRODUCTS_DISPLAY
+
+        assert vars(config)["MAX_PRODUCTS_DISPLAY"] == MAX_PRODUCTS_DISPLAY
+        assert MAX_PRODUCTS_DISPLAY == CONFIG.MAX_PRODUCTS_DISPLAY
+        assert "MAX_PRODUCTS_DISPLAY" in config.__all__
+
+    @pytest.mark.parametrize("name", ["OPENAI_API_KEY", "LANGFUSE_SECRET_KEY"])
+    def test_secrets_not_exported(self, name):
+        """Test API secrets are only reachable through CONFIG"""
+        assert name not in vars(config)
+        assert name not in config.__all__
+        with pytest.raises(AttributeError):
+            getattr(config, name)
+
+    def test_setting_conversions_memoized(self, monkeypatch):
+        """Test parsing the same raw value again reuses the cached conversion"""
+        monkeypatch.setenv("APP_PORT", "9100")
+
+        config._parse_settings()
+        hits = config._convert.cache_info().hits
+        parsed = config._parse_settings()
+
+        assert parsed["APP_PORT"] == 9100
+        assert config._convert.cache_info().hits > hits
+
+    def test_settings_snapshot_round_trip(self, monkeypatch, isolated_settings):
+        """Test workers can load settings from the published snapshot"""
+        # Register the variable with monkeypatch so publishing does not leak it
+        monkeypatch.setenv(config.SNAPSHOT_ENV_VAR, "")
+
+        shm = config.publish_settings_snapshot()
+        try:
+            assert os.environ[config.SNAPSHOT_ENV_VAR] == shm.name
+            snapshot = config._read_settings_snapshot(shm.name)
+        finally:
+            shm.close()
+            shm.unlink()
+
+        assert dict(snapshot) == dict(config._PARSED)
+        assert Config(**snapshot) == CONFIG
+
+    def test_config_repr_hides_secrets(self, monkeypatch):
+        """Test API keys never show up in the config repr"""
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-test-secret")
+        monkeypatch.setenv("LANGFUSE_SECRET_KEY", "sk-lf-test-secret")
+
+        text = repr(Config.from_env())
+
+        assert "sk-test-secret" not in text
+        assert "sk-lf-test-secret" not in text
+        assert "OPENAI_MODEL=" in text
+
+    def test_config_immutable(self):
+        """Test settings cannot be reassigned after startup"""
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            CONFIG.APP_PORT = 9000  # type: ignore[misc]
+
+
+class TestCompiledEnvironment:
+    """Test the compiled .env cache used at startup"""
+
+    def test_compile_env_writes_module(self, tmp_path):
+        """Test the compile step emits the parsed variables and source mtime"""
+        env_file = tmp_path / ".env"
+        env_file.write_text("OPENAI_MODEL=gpt-4o\nAPP_PORT=9000\n")
+        output_file = tmp_path / "_env_compiled.py"
+
+        assert compile_env(env_file, output_file) == 2
+
+        namespace: dict = {}
+        exec(output_file.read_text(), namespace)
+        assert namespace["ENV"] == {"OPENAI_MODEL": "gpt-4o", "APP_PORT": "9000"}
+        assert namespace["SOURCE_MTIME"] == env_file.stat().st_mtime
+
+    def test_compiled_cache_does_not_override_environment(self, monkeypatch):
+        """Test cached values only fill variables that are not already set"""
+        compiled = SimpleNamespace(
+            ENV={"APP_TITLE": "Cached", "OPENAI_MODEL": "cached-model"},
+            SOURCE_MTIME=0.0,
+        )
+        monkeypatch.setitem(sys.modules, "_env_compiled", compiled)
+        monkeypatch.setattr(config, "ENV_FILE", config.ENV_FILE.with_name("missing"))
+        monkeypatch.setenv("OPENAI_MODEL", "from-environment")
+        # Register APP_TITLE with monkeypatch so it is unset again afterwards
+        monkeypatch.setenv("APP_TITLE", "")
+        monkeypatch.delenv("APP_TITLE")
+
+        config._load_environment()
+
+        assert os.environ["APP_TITLE"] == "Cached"
+        assert os.environ["OPENAI_MODEL"] == "from-environment"
+
+    def test_stale_compiled_cache_falls_back_to_dotenv(self, monkeypatch, tmp_path):
+        """Test a cache older than .env is ignored in favour of dotenv"""
+        env_file = tmp_path / ".env"
+        env_file.write_text("APP_TITLE=Fresh\n")
+        compiled = SimpleNamespace(ENV={"APP_TITLE": "Stale"}, SOURCE_MTIME=0.0)
+        monkeypatch.setitem(sys.modules, "_env_compiled", compiled)
+        monkeypatch.setattr(config, "ENV_FILE", env_file)
+        # Register APP_TITLE with monkeypatch so it is unset again afterwards
+        monkeypatch.setenv("APP_TITLE", "")
+        monkeypatch.delenv("APP_TITLE")
+
+        config._load_environment()
+
+        assert os.environ["APP_TITLE"] == "Fresh"
+
+    def test_production_skips_dotenv(self, monkeypatch):
+        """Test .env is not read outside development"""
+        monkeypatch.setenv("APP_ENV", "production")
+        monkeypatch.setattr(config, "_load_dotenv", lambda: pytest.fail("loaded"))
+        monkeypatch.delitem(sys.modules, "_env_compiled", raising=False)
 
-        # Note: This test may need module reload in real scenarios
-        assert isinstance(Config.INTENT_CONFIDENCE_THRESHOLD, float)
+        config._load_environment()
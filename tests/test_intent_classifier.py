@@ -1,10 +1,27 @@
 """Tests for intent classification service"""
+import asyncio
 import json
-from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 
-from services.intent_classifier import IntentClassifier
+from services.intent_classifier import IntentBatcher, IntentClassifier
+from services.response_cache import SemanticCache
+
+_MOCK_CONTENT = (
+    '{"intent": "SEARCH_PRODUCTS", "confidence": 0.95, '
+    '"entities": ["gaming", "laptop"], '
+    '"reasoning": "Customer looking for gaming laptop"}'
+)
+
+
+def _fake_openai_response(content: str) -> SimpleNamespace:
+    """Build the slice of a chat completion the classifier reads"""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+    )
 
 
 class TestIntentClassifier:
@@ -15,77 +32,246 @@ class TestIntentClassifier:
         """Create intent classifier instance"""
         return IntentClassifier()
 
+    @pytest.fixture
+    def create_mock(self, classifier):
+        """Stand-in for the OpenAI chat completions call"""
+        classifier.client.chat.completions.create = AsyncMock()
+        return classifier.client.chat.completions.create
+
     @pytest.fixture
     def mock_openai_response(self):
         """Mock OpenAI API response"""
-        mock_choice = MagicMock()
-        mock_choice.message.content = json.dumps(
-            {
-                "intent": "SEARCH_PRODUCTS",
-                "confidence": 0.95,
-                "entities": ["gaming", "laptop"],
-                "reasoning": "Customer looking for gaming laptop",
-            }
+        return _fake_openai_response(_MOCK_CONTENT)
+
+    @pytest.mark.asyncio
+    async def test_classify_intent_success(
+        self, classifier, create_mock, mock_openai_response
+    ):
+        """Test successful intent classification"""
+        create_mock.return_value = mock_openai_response
+        result = await classifier.classify_intent(
+            "I want a gaming laptop", "test@example.com"
         )
 
-        mock_response = MagicMock()
-        mock_response.choices = [mock_choice]
-        return mock_response
+        assert result["intent"] == "SEARCH_PRODUCTS"
+        assert result["intent"] is sys.intern("SEARCH_PRODUCTS")
+        assert result["confidence"] == 0.95
+        assert "gaming" in result["entities"]
+        assert "laptop" in result["entities"]
+
+        kwargs = create_mock.await_args.kwargs
+        assert kwargs["response_format"]["json_schema"]["strict"] is True
+        assert kwargs["messages"][-1]["content"] == "I want a gaming laptop"
+        assert kwargs["messages"][0]["content"] is classifier._system_prompt
 
     @pytest.mark.asyncio
-    async def test_classify_intent_success(self, classifier, mock_openai_response):
-        """Test successful intent classification"""
-        with patch.object(
-            classifier.client.chat.completions, "create", new_callable=AsyncMock
-        ) as mock_create:
-            mock_create.return_value = mock_openai_response
-            result = await classifier.classify_intent(
-                "I want a gaming laptop", "test@example.com"
-            )
+    async def test_classify_intent_cached(
+        self, classifier, create_mock, mock_openai_response
+    ):
+        """Test repeated messages are answered from the response cache"""
+        create_mock.return_value = mock_openai_response
+        first = await classifier.classify_intent("Gaming laptop", "a@example.com")
+        second = await classifier.classify_intent("  gaming LAPTOP ", "b@example.com")
+
+        assert first == second
+        assert create_mock.await_count == 1
+        assert classifier.cache.hits == 1
+
+    @pytest.mark.asyncio
+    async def test_classify_intent_semantic_cache(self, classifier, create_mock):
+        """Test paraphrased messages reuse the intent, not the entities"""
+        classifier.semantic_cache = SemanticCache(maxsize=4, threshold=0.9)
+        embeddings = SimpleNamespace(data=[SimpleNamespace(embedding=[0.6, 0.8, 0.0])])
+
+        create_mock.return_value = _fake_openai_response(
+            '{"intent": "ORDER_STATUS", "confidence": 0.9, "entities": ["48213"]}'
+        )
+        classifier.client.embeddings.create = AsyncMock(return_value=embeddings)
+        await classifier.classify_intent("where is my parcel 48213", "a@example.com")
+        second = await classifier.classify_intent(
+            "has my parcel shipped yet", "a@example.com"
+        )
+
+        assert second == {"intent": "ORDER_STATUS", "confidence": 0.9, "entities": []}
+        assert create_mock.await_count == 1
+        assert classifier.semantic_cache.hits == 1
+
+    @pytest.mark.asyncio
+    async def test_classify_intent_semantic_cache_search(self, classifier, create_mock):
+        """Test similar product searches keep their own entities"""
+        classifier.semantic_cache = SemanticCache(maxsize=4, threshold=0.9)
+        embeddings = SimpleNamespace(data=[SimpleNamespace(embedding=[0.6, 0.8, 0.0])])
+
+        create_mock.side_effect = [
+            _fake_openai_response(_MOCK_CONTENT),
+            _fake_openai_response(
+                '{"intent": "SEARCH_PRODUCTS", "confidence": 0.9, '
+                '"entities": ["office", "laptop"]}'
+            ),
+        ]
+        classifier.client.embeddings.create = AsyncMock(return_value=embeddings)
+        await classifier.classify_intent("gaming laptop", "a@example.com")
+        second = await classifier.classify_intent(
+            "cheap office laptop", "a@example.com"
+        )
+
+        assert second["entities"] == ["office", "laptop"]
+        assert create_mock.await_count == 2
+        assert len(classifier.semantic_cache) == 0
+
+    @pytest.mark.parametrize("confidence, llm_calls", [(0.9, 0), (0.4, 1)])
+    @pytest.mark.asyncio
+    async def test_classify_intent_local_model(
+        self, classifier, create_mock, mock_openai_response, confidence, llm_calls
+    ):
+        """Test a confident local model answer skips the OpenAI call"""
+        classifier.local_model = MagicMock()
+        classifier.local_model.predict.return_value = {
+            "intent": "ORDER_STATUS",
+            "confidence": confidence,
+            "entities": [],
+        }
+
+        create_mock.return_value = mock_openai_response
+        result = await classifier.classify_intent("where is my order", "a@b.c")
+
+        assert create_mock.await_count == llm_calls
+        expected = "ORDER_STATUS" if llm_calls == 0 else "SEARCH_PRODUCTS"
+        assert result["intent"] == expected
+
+    @pytest.mark.parametrize(
+        "message, intent, entities",
+        [
+            ("hi", "GREETING", []),
+            ("Thank you!", "GREETING", []),
+            ("status of order #48213?", "ORDER_STATUS", ["48213"]),
+            ("hi, I need a new monitor", None, None),
+            ("I want to order 5000 cables", None, None),
+        ],
+    )
+    @pytest.mark.asyncio
+    async def test_classify_intent_fast_path(
+        self, classifier, create_mock, mock_openai_response, message, intent, entities
+    ):
+        """Test trivial messages are classified without calling OpenAI"""
+        create_mock.return_value = mock_openai_response
+        result = await classifier.classify_intent(message, "a@b.c")
 
-            assert result["intent"] == "SEARCH_PRODUCTS"
-            assert result["confidence"] == 0.95
-            assert "gaming" in result["entities"]
-            assert "laptop" in result["entities"]
+        if intent is None:
+            assert create_mock.await_count == 1
+        else:
+            assert create_mock.await_count == 0
+            assert result["intent"] == intent
+            assert result["entities"] == entities
 
     @pytest.mark.asyncio
-    async def test_classify_intent_api_error(self, classifier):
+    async def test_classify_intent_api_error(self, classifier, create_mock):
         """Test intent classification with API error"""
-        with patch.object(
-            classifier.client.chat.completions,
-            "create",
-            new_callable=AsyncMock,
-            side_effect=Exception("API Error"),
-        ):
-            result = await classifier.classify_intent(
-                "test message", "test@example.com"
-            )
+        create_mock.side_effect = Exception("API Error")
+        result = await classifier.classify_intent("test message", "test@example.com")
 
-            assert result["intent"] == "OTHER"
-            assert result["confidence"] == 0.5
-            assert result["entities"] == []
-            assert "Classification failed" in result["reasoning"]
+        assert result["intent"] == "OTHER"
+        assert result["confidence"] == 0.5
+        assert result["entities"] == []
+        assert "Classification failed" in result["reasoning"]
 
     @pytest.mark.asyncio
-    async def test_classify_intent_invalid_json(self, classifier):
+    async def test_classify_intent_invalid_json(self, classifier, create_mock):
         """Test intent classification with invalid JSON response"""
-        mock_choice = MagicMock()
-        mock_choice.message.content = "Invalid JSON"
-        mock_response = MagicMock()
-        mock_response.choices = [mock_choice]
-
-        with patch.object(
-            classifier.client.chat.completions,
-            "create",
-            new_callable=AsyncMock,
-            return_value=mock_response,
-        ):
-            result = await classifier.classify_intent(
-                "test message", "test@example.com"
+        mock_response = _fake_openai_response("Invalid JSON")
+
+        create_mock.return_value = mock_response
+        result = await classifier.classify_intent("test message", "test@example.com")
+
+        assert result["intent"] == "OTHER"
+        assert result["confidence"] == 0.5
+
+    @pytest.mark.asyncio
+    async def test_classify_intent_unknown_category(self, classifier, create_mock):
+        """Test unknown intents from the model fall back to OTHER"""
+        mock_response = _fake_openai_response(
+            json.dumps(
+                {"intent": "REFUND", "confidence": 0.9, "entities": [], "reasoning": ""}
+            )
+        )
+
+        create_mock.return_value = mock_response
+        result = await classifier.classify_intent(
+            "I want my money back", "test@example.com"
+        )
+
+        assert result["intent"] == "OTHER"
+        assert result["confidence"] == 0.9
+
+    @pytest.mark.asyncio
+    async def test_classify_intent_batched(self, classifier, create_mock):
+        """Test concurrent messages share one OpenAI call when batching"""
+        classifier.batcher = IntentBatcher(classifier, max_size=8, window=0.05)
+        mock_response = _fake_openai_response(
+            json.dumps(
+                {
+                    "classifications": [
+                        {"intent": "GREETING", "confidence": 0.9, "entities": []},
+                        {"intent": "ORDER_STATUS", "confidence": 0.8, "entities": []},
+                    ]
+                }
             )
+        )
+
+        create_mock.return_value = mock_response
+        greeting, order = await asyncio.gather(
+            classifier.classify_intent("hello there, quick question", "a@example.com"),
+            classifier.classify_intent("where is my order", "b@example.com"),
+        )
+
+        assert create_mock.await_count == 1
+        assert greeting["intent"] == "GREETING"
+        assert order["intent"] == "ORDER_STATUS"
+        await classifier.aclose()
+
+    @pytest.mark.asyncio
+    async def test_classify_intent_batch_mismatch(self, classifier, create_mock):
+        """Test a malformed batch reply falls back for every message"""
+        classifier.batcher = IntentBatcher(classifier, max_size=8, window=0.05)
+        mock_response = _fake_openai_response(
+            json.dumps({"classifications": [{"intent": "GREETING"}]})
+        )
+
+        create_mock.return_value = mock_response
+        results = await asyncio.gather(
+            classifier.classify_intent("hello there, quick question", "a@example.com"),
+            classifier.classify_intent("where is my order", "b@example.com"),
+        )
 
-            assert result["intent"] == "OTHER"
-            assert result["confidence"] == 0.5
+        assert [result["intent"] for result in results] == ["OTHER", "OTHER"]
+        assert len(classifier.cache) == 0
+        await classifier.aclose()
+
+    @pytest.mark.asyncio
+    async def test_batcher_aclose_cancels_inflight(self, classifier, monkeypatch):
+        """Test closing the batcher cancels batches still awaiting OpenAI"""
+        classifier.batcher = IntentBatcher(classifier, max_size=8, window=0.01)
+        started = asyncio.Event()
+
+        async def stalled_batch(messages):
+            started.set()
+            await asyncio.Event().wait()
+
+        monkeypatch.setattr(classifier, "_classify_batch", stalled_batch)
+        callers = [
+            asyncio.create_task(classifier.batcher.submit(message))
+            for message in ("first", "second")
+        ]
+        await started.wait()
+
+        await classifier.batcher.aclose()
+
+        # Bounded so a regression fails here instead of hanging the suite
+        results = await asyncio.wait_for(
+            asyncio.gather(*callers, return_exceptions=True), 1
+        )
+        assert all(isinstance(r, asyncio.CancelledError) for r in results)
+        assert not classifier.batcher._inflight
 
     def test_get_category_description(self, classifier):
         """Test category description mapping"""
@@ -101,7 +287,7 @@ class TestIntentClassifier:
 
     def test_build_system_prompt(self, classifier):
         """Test system prompt construction"""
-        prompt = classifier._build_system_prompt()
+        prompt = classifier._system_prompt
 
         assert "intent classifier" in prompt
         assert "SEARCH_PRODUCTS" in prompt
@@ -2,19 +2,22 @@
 from unittest.mock import patch
 
 import pytest
-from fastapi.testclient import TestClient
 
-from main import app
+from config import (
+    CUSTOMER_EMAILS,
+    CUSTOMER_INDEX,
+    CUSTOMER_PINS,
+    CUSTOMERS,
+    INTENT_CATEGORIES,
+    MCP_TOOLS,
+)
+from main import _sse_frame
+from services.auth import login_throttle
 
 
 class TestMainApp:
     """Test main FastAPI application"""
 
-    @pytest.fixture
-    def client(self):
-        """Create test client"""
-        return TestClient(app)
-
     def test_health_endpoint(self, client):
         """Test health check endpoint"""
         response = client.get("/health")
@@ -30,8 +33,22 @@ class TestMainApp:
         data = response.json()
         assert "app_title" in data
         assert "intent_threshold" in data
+        assert set(data["cache"]["intent"]) == {"hits", "misses", "size"}
         assert "streaming_enabled" in data
 
+    def test_tools_endpoint(self, client):
+        """Test MCP tool schema endpoint"""
+        response = client.get("/tools")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        names = [tool["function"]["name"] for tool in response.json()]
+        assert "search_products" in names
+
+        cached = client.get(
+            "/tools", headers={"If-None-Match": response.headers["etag"]}
+        )
+        assert cached.status_code == 304
+
     def test_auth_endpoint_valid_credentials(self, client):
         """Test authentication with valid credentials"""
         response = client.post(
@@ -52,6 +69,18 @@ class TestMainApp:
         assert data["success"] is False
         assert data["customer"] is None
 
+    def test_auth_endpoint_locks_out_after_failures(self, client):
+        """Test repeated wrong PINs are throttled, even with the right PIN"""
+        email = "donaldgarcia@example.net"
+        try:
+            for _ in range(login_throttle.max_failures):
+                client.post("/auth", json={"email": email, "pin": "0000"})
+            response = client.post("/auth", json={"email": email, "pin": "7912"})
+            assert response.status_code == 429
+            assert response.json()["success"] is False
+        finally:
+            login_throttle.clear()
+
     def test_auth_endpoint_missing_data(self, client):
         """Test authentication with missing data"""
         response = client.post("/auth", json={})
@@ -67,10 +96,15 @@ class TestMainApp:
         assert "Customer Support Chat" in response.text
         assert "login()" in response.text
         assert "sendMessage()" in response.text
+        assert response.headers["cache-control"] == "public, max-age=3600"
 
-    def test_test_endpoint_file_not_found(self, client):
+    def test_test_endpoint_file_not_found(self, client, monkeypatch):
         """Test /test endpoint when test.html doesn't exist"""
-        # This test assumes test.html doesn't exist
+
+        def missing_page():
+            raise FileNotFoundError("test.html")
+
+        monkeypatch.setattr("main._test_page", missing_page)
         with pytest.raises(FileNotFoundError):
             client.get("/test")
 
@@ -98,6 +132,99 @@ class TestMainApp:
         # Should return streaming response
         assert response.status_code == 200
         assert "text/event-stream" in response.headers["content-type"]
+        assert response.text.startswith("data: Hello test@example.com")
+        assert response.text.endswith("data: [DONE]\n\n")
+
+    def test_sse_frame_multiline(self):
+        """Test multi-line chunks become one SSE event with several data fields"""
+        assert _sse_frame("Found 2:\n[A]\n") == b"data: Found 2:\ndata: [A]\ndata: \n\n"
+
+    @pytest.mark.parametrize(
+        "intent, route_calls", [("ORDER_STATUS", 1), ("SEARCH_PRODUCTS", 2)]
+    )
+    @patch("main.intent_classifier.classify_intent")
+    @patch("main.mcp_client.route_intent_to_mcp")
+    def test_chat_speculative_routing(
+        self, mock_route, mock_classify, intent, route_calls, client
+    ):
+        """Test order routing starts early and is reused only on a match"""
+        mock_classify.return_value = {
+            "intent": intent,
+            "confidence": 0.9,
+            "entities": [],
+            "reasoning": "Order lookup",
+        }
+        mock_route.return_value = (None, "Your orders")
+
+        response = client.get("/chat/donaldgarcia@example.net?message=track my order")
+
+        assert response.status_code == 200
+        assert mock_route.await_count == route_calls
+        assert mock_route.await_args_list[0].args[0] == "ORDER_STATUS"
+        assert mock_route.await_args.args[0] == intent
+
+    @patch("main.intent_classifier.classify_intent")
+    @patch("main.mcp_client.route_intent_to_mcp")
+    def test_chat_no_speculation_for_unknown_customer(
+        self, mock_route, mock_classify, client
+    ):
+        """Test unknown customers are routed with the classified entities"""
+        mock_classify.return_value = {
+            "intent": "ORDER_STATUS",
+            "confidence": 0.9,
+            "entities": ["laptop"],
+            "reasoning": "Order lookup",
+        }
+        mock_route.return_value = (None, "Our catalog")
+
+        response = client.get("/chat/test@example.com?message=track my laptop order")
+
+        assert response.status_code == 200
+        assert mock_route.await_count == 1
+        assert mock_route.await_args.args[:2] == ("ORDER_STATUS", ["laptop"])
+
+    @pytest.mark.parametrize(
+        "message", ["I want to order a laptop", "buy a monitor", "ordering help"]
+    )
+    @patch("main.intent_classifier.classify_intent")
+    @patch("main.mcp_client.route_intent_to_mcp")
+    def test_chat_no_speculation_for_purchases(
+        self, mock_route, mock_classify, message, client
+    ):
+        """Test purchase phrasing does not start an order status lookup"""
+        mock_classify.return_value = {
+            "intent": "PLACE_ORDER",
+            "confidence": 0.9,
+            "entities": [],
+            "reasoning": "Purchase",
+        }
+        mock_route.return_value = (None, "Our catalog")
+
+        response = client.get(f"/chat/test@example.com?message={message}")
+
+        assert response.status_code == 200
+        assert mock_route.await_count == 1
+        assert mock_route.await_args.args[0] == "PLACE_ORDER"
+
+    @patch("main.intent_classifier.classify_intent")
+    def test_chat_websocket_multiple_turns(self, mock_classify, client):
+        """Test one WebSocket carries several chat turns"""
+        mock_classify.return_value = {
+            "intent": "GREETING",
+            "confidence": 0.9,
+            "entities": [],
+            "reasoning": "Customer greeting",
+        }
+
+        with client.websocket_connect("/ws/test@example.com") as websocket:
+            for message in ("hello", "thanks"):
+                websocket.send_text(message)
+                chunks = []
+                while (chunk := websocket.receive_text()) != "[DONE]":
+                    chunks.append(chunk)
+                assert chunks
+
+        assert mock_classify.await_count == 2
 
 
 class TestCustomerData:
@@ -105,29 +232,29 @@ class TestCustomerData:
 
     def test_all_test_customers_valid(self):
         """Test all predefined test customers have valid data"""
-        from config import CUSTOMERS
-
         assert len(CUSTOMERS) == 10
 
-        # Check email formats
-        for email in CUSTOMERS.keys():
-            assert "@" in email
-            assert "." in email
-
-        # Check PIN formats (4 digits)
-        for pin in CUSTOMERS.values():
-            assert len(pin) == 4
-            assert pin.isdigit()
+        # Emails look like addresses and PINs are 4 digits
+        for email, pin in CUSTOMERS.items():
+            assert "@" in email and "." in email
+            assert len(pin) == 4 and pin.isdigit()
 
     def test_customer_uniqueness(self):
         """Test customer emails and PINs are unique"""
-        from config import CUSTOMERS
+        # Emails are the mapping's keys, so only the PINs can collide
+        assert len(set(CUSTOMERS.values())) == len(CUSTOMERS)
 
-        emails = list(CUSTOMERS.keys())
-        pins = list(CUSTOMERS.values())
+    def test_customer_columns_aligned(self):
+        """Test the column tuples and index agree with CUSTOMERS"""
+        assert len(CUSTOMER_EMAILS) == len(CUSTOMER_PINS) == len(CUSTOMERS)
+        for email, pin in CUSTOMERS.items():
+            assert CUSTOMER_EMAILS[CUSTOMER_INDEX[email]] == email
+            assert CUSTOMER_PINS[CUSTOMER_INDEX[email]] == pin
 
-        assert len(set(emails)) == len(emails)  # Unique emails
-        assert len(set(pins)) == len(pins)  # Unique PINs
+    def test_customers_read_only(self):
+        """Test the customer table cannot be mutated at runtime"""
+        with pytest.raises(TypeError):
+            CUSTOMERS["intruder@example.com"] = "0000"  # type: ignore[index]
 
 
 class TestIntentCategories:
@@ -135,8 +262,6 @@ class TestIntentCategories:
 
     def test_intent_categories_complete(self):
         """Test all required intent categories are defined"""
-        from config import INTENT_CATEGORIES
-
         expected_categories = [
             "SEARCH_PRODUCTS",
             "ORDER_STATUS",
@@ -153,8 +278,6 @@ class TestIntentCategories:
 
     def test_mcp_tools_defined(self):
         """Test MCP tools are properly defined"""
-        from config import MCP_TOOLS
-
         expected_tools = [
             "verify_customer_pin",
             "get_customer",
@@ -170,3 +293,9 @@ class TestIntentCategories:
             assert tool in MCP_TOOLS
             assert "description" in MCP_TOOLS[tool]
             assert "params" in MCP_TOOLS[tool]
+
+    def test_mcp_tools_read_only(self):
+        """Test MCP tool schema is immutable all the way down"""
+        with pytest.raises(TypeError):
+            MCP_TOOLS["get_order"]["params"] = ()  # type: ignore[index]
+        assert isinstance(MCP_TOOLS["create_order"]["params"], tuple)
@@ -0,0 +1,258 @@
+"""Tests for MCP client service"""
+import dataclasses
+import json
+
+import httpx
+import orjson
+import pytest
+
+from config import CONFIG, MCP_TOOLS
+from services import mcp_transport
+from services.mcp_client import (
+    MCP_TOOLS_ETAG,
+    MCP_TOOLS_JSON,
+    MCPClient,
+    _extract_mcp_text,
+)
+
+
+class TestMCPToolsSchema:
+    """Test MCP tool schema rendering"""
+
+    def test_schema_lists_every_tool(self):
+        """Test every MCP tool is rendered as a function definition"""
+        tools = json.loads(MCP_TOOLS_JSON)
+
+        assert [tool["function"]["name"] for tool in tools] == list(MCP_TOOLS)
+        create_order = tools[-1]["function"]
+        assert create_order["parameters"]["required"] == [
+            "customer_id",
+            "product_id",
+            "quantity",
+        ]
+        assert create_order["parameters"]["properties"]["quantity"] == {
+            "type": "integer"
+        }
+
+    def test_schema_etag(self):
+        """Test the ETag is a quoted digest of the serialized schema"""
+        assert MCP_TOOLS_ETAG.startswith('"') and MCP_TOOLS_ETAG.endswith('"')
+        assert len(MCP_TOOLS_ETAG) == 18
+
+
+@pytest.mark.parametrize(
+    "response, expected",
+    [
+        ({"result": {"structuredContent": {"result": "structured"}}}, "structured"),
+        ({"result": {"content": [{"text": "plain"}]}}, "plain"),
+        ({"result": {"other": 1}}, "{'other': 1}"),
+        ({"result": {}}, None),
+        ({"error": {"message": "boom"}}, None),
+    ],
+)
+def test_extract_mcp_text(response, expected):
+    """Test every MCP response shape goes through one extractor"""
+    assert _extract_mcp_text(response) == expected
+
+
+@pytest.mark.parametrize(
+    "entities, category",
+    [
+        (["27-inch", "Monitor"], "Monitors"),
+        (["gaming LAPTOP"], "Computers"),
+        (["desktop computer", "monitor"], "Computers"),
+        (["laptop monitor arm"], "Monitors"),
+        (["keyboard"], None),
+        ([], None),
+    ],
+)
+@pytest.mark.asyncio
+async def test_default_products_category(entities, category):
+    """Test the first matching entity picks the listing, monitors first"""
+    tool_msg = await MCPClient()._handle_default_products(entities)
+    assert tool_msg["params"]["arguments"] == {"category": category}
+
+
+@pytest.mark.parametrize(
+    "intent, customer, tool",
+    [
+        ("SEARCH_PRODUCTS", "someone@example.com", "search_products"),
+        ("WARRANTY_SUPPORT", "someone@example.com", "list_products"),
+        ("PLACE_ORDER", "donaldgarcia@example.net", "list_products"),
+        ("ORDER_STATUS", "someone@example.com", "list_products"),
+        ("TECH_SUPPORT", "donaldgarcia@example.net", "list_products"),
+    ],
+)
+@pytest.mark.asyncio
+async def test_route_intent_dispatch(intent, customer, tool):
+    """Test intents map to tools and unknown customers fall back to listings"""
+    tool_msg, direct = await MCPClient().route_intent_to_mcp(
+        intent, [], "search monitors", customer
+    )
+    assert direct == ""
+    assert tool_msg is not None
+    assert tool_msg["params"]["name"] == tool
+
+
+class TestMCPClientConnectionPool:
+    """Test the pooled HTTP client is shared across calls"""
+
+    @pytest.fixture
+    def mcp_client(self):
+        """Create MCP client pointed at a mock server"""
+        client = MCPClient()
+        client.server_url = "http://mcp.test/mcp"
+        return client
+
+    @pytest.mark.asyncio
+    async def test_get_client_reused(self, mcp_client):
+        """Test the same HTTP client is returned until closed"""
+        first = mcp_client.get_client()
+        assert mcp_client.get_client() is first
+
+        await mcp_client.aclose()
+        assert first.is_closed
+        assert mcp_client.get_client() is not first
+        await mcp_client.aclose()
+
+    def test_pool_limits_from_config(self, mcp_client):
+        """Test keep-alive connections outlive the gap between chat turns"""
+        assert mcp_client.limits.keepalive_expiry == CONFIG.MCP_KEEPALIVE_EXPIRY
+        assert mcp_client.limits.max_keepalive_connections == CONFIG.MCP_MAX_KEEPALIVE
+        assert mcp_client.limits.max_connections == CONFIG.MCP_MAX_CONNECTIONS
+
+    @pytest.mark.parametrize(
+        "transport, available", [("httpx", True), ("aiohttp", False)]
+    )
+    def test_transport_defaults_to_httpx(self, monkeypatch, transport, available):
+        """Test httpx's own pool is used unless aiohttp is requested and present"""
+        monkeypatch.setattr(
+            mcp_transport,
+            "CONFIG",
+            dataclasses.replace(CONFIG, MCP_TRANSPORT=transport),
+        )
+        monkeypatch.setattr(mcp_transport, "AIOHTTP_AVAILABLE", available)
+        assert mcp_transport.build_mcp_transport(httpx.Limits()) is None
+
+    @pytest.mark.asyncio
+    async def test_execute_mcp_call_uses_pooled_client(self, mcp_client):
+        """Test tool calls go through the shared client"""
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return httpx.Response(
+                200, json={"result": {"content": [{"text": "Found 1 product"}]}}
+            )
+
+        mcp_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        tool_msg = {"jsonrpc": "2.0", "method": "tools/call", "id": 2}
+
+        first = await mcp_client.execute_mcp_call(tool_msg)
+        second = await mcp_client.execute_mcp_call(tool_msg)
+
+        assert first == second == {"content": "Found 1 product"}
+        assert len(calls) == 2
+        assert not mcp_client._client.is_closed
+        await mcp_client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_catalog_calls_cached(self, mcp_client):
+        """Test read-only catalog lookups hit the server once"""
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return httpx.Response(
+                200, json={"result": {"content": [{"text": "Found 1 product"}]}}
+            )
+
+        mcp_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        tool_msg = {
+            "jsonrpc": "2.0",
+            "method": "tools/call",
+            "id": 2,
+            "params": {"name": "search_products", "arguments": {"query": "monitor"}},
+        }
+
+        first = await mcp_client.execute_mcp_call(tool_msg)
+        second = await mcp_client.execute_mcp_call(tool_msg)
+
+        assert first == second == {"content": "Found 1 product"}
+        assert len(calls) == 1
+        await mcp_client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_order_status_sends_prebuilt_verify_payload(self, mcp_client):
+        """Test order lookups verify once, with the prebuilt request body"""
+        bodies = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            bodies.append(orjson.loads(request.content))
+            text = "Customer: Donald Garcia, ID: 1a2b-3c4d"
+            return httpx.Response(200, json={"result": {"content": [{"text": text}]}})
+
+        mcp_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        tool_msg, direct = await mcp_client.route_intent_to_mcp(
+            "ORDER_STATUS", [], "where is my order", "donaldgarcia@example.net"
+        )
+
+        assert direct == ""
+        assert tool_msg["params"]["arguments"] == {"customer_id": "1a2b-3c4d"}
+        assert bodies[0]["params"]["arguments"] == {
+            "email": "donaldgarcia@example.net",
+            "pin": "7912",
+        }
+
+        again, _ = await mcp_client.route_intent_to_mcp(
+            "ORDER_STATUS", [], "and my other order?", "donaldgarcia@example.net"
+        )
+        assert again == tool_msg
+        assert len(bodies) == 1
+        await mcp_client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_account_info_reuses_verified_details(self, mcp_client):
+        """Test account lookups reuse the details from an earlier verify"""
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            text = "Customer: Donald Garcia, ID: 1a2b-3c4d"
+            return httpx.Response(200, json={"result": {"content": [{"text": text}]}})
+
+        mcp_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        await mcp_client.route_intent_to_mcp(
+            "ORDER_STATUS", [], "where is my order", "donaldgarcia@example.net"
+        )
+        _, direct = await mcp_client.route_intent_to_mcp(
+            "ACCOUNT_INFO", [], "show my account", "donaldgarcia@example.net"
+        )
+
+        assert direct == (
+            "Your account information:\nCustomer: Donald Garcia, ID: 1a2b-3c4d"
+        )
+        assert len(calls) == 1
+        await mcp_client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_order_status_after_account_info_skips_verify(self, mcp_client):
+        """Test both handlers share one verify round-trip"""
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            text = "Customer: Michelle James, ID: 5e6f-7a8b"
+            return httpx.Response(200, json={"result": {"content": [{"text": text}]}})
+
+        mcp_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        await mcp_client.route_intent_to_mcp(
+            "ACCOUNT_INFO", [], "show my account", "michellejames@example.com"
+        )
+        tool_msg, _ = await mcp_client.route_intent_to_mcp(
+            "ORDER_STATUS", [], "where is my order", "michellejames@example.com"
+        )
+
+        assert tool_msg["params"]["arguments"] == {"customer_id": "5e6f-7a8b"}
+        assert len(calls) == 1
+        await mcp_client.aclose()
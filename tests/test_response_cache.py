@@ -0,0 +1,58 @@
+"""Tests for the response caches"""
+from unittest.mock import patch
+
+from services.response_cache import SemanticCache, TTLCache, cache_key
+
+
+class TestTTLCache:
+    """Test the exact-match LRU + TTL cache"""
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is dropped first"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    def test_expiry(self):
+        """Test entries are not served after their TTL"""
+        cache = TTLCache(maxsize=2, ttl=10)
+        with patch("services.response_cache.time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+        with patch("services.response_cache.time.monotonic", return_value=111.0):
+            assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_cache_key_hashes_parts(self):
+        """Test keys are stable hashes that keep parts separate"""
+        assert cache_key("a", "bc") == cache_key("a", "bc")
+        assert cache_key("a", "bc") != cache_key("ab", "c")
+
+
+class TestSemanticCache:
+    """Test the embedding similarity cache"""
+
+    def test_similar_embedding_hits(self):
+        """Test near-identical embeddings share a cached value"""
+        cache = SemanticCache(maxsize=4, threshold=0.9)
+        cache.set([1.0, 0.0, 0.0], "orders")
+
+        assert cache.get([0.99, 0.05, 0.0]) == "orders"
+        assert cache.get([0.0, 1.0, 0.0]) is None
+        assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+    def test_ring_overwrites_oldest(self):
+        """Test the oldest embedding is replaced once the ring is full"""
+        cache = SemanticCache(maxsize=2, threshold=0.9)
+        cache.set([1.0, 0.0, 0.0], "first")
+        cache.set([0.0, 1.0, 0.0], "second")
+        cache.set([0.0, 0.0, 1.0], "third")
+
+        assert len(cache) == 2
+        assert cache.get([1.0, 0.0, 0.0]) is None
+        assert cache.get([0.0, 0.0, 1.0]) == "third"